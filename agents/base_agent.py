@@ -1,48 +1,190 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Optional
+from typing import Dict, Any, AsyncIterator, Awaitable, Callable, FrozenSet, Mapping, Optional, Type, TypeVar
+from core.json_utils import extract_json_async
 from models.schemas import InvestigationState, AgentMessage
-from services.llm_providers import LLMProvider
+from pydantic import BaseModel, ValidationError
+from services.llm_providers import LLMProvider, cacheable_system_blocks
 from datetime import datetime
+from collections import OrderedDict
+from functools import lru_cache
+from types import MappingProxyType
+import hashlib
 import logging
+import threading
 
 logger = logging.getLogger(__name__)
 
+# Maximum number of LLM responses memoized per agent
+RESPONSE_CACHE_SIZE = 256
+
+# Maximum number of rendered context strings memoized per agent
+CONTEXT_CACHE_SIZE = 128
+
+# Shared read-only default; AgentMessage validation copies it into a per-message dict
+_EMPTY_METADATA: Mapping[str, Any] = MappingProxyType({})
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+@lru_cache(maxsize=None)
+def _get_logger(name: str) -> logging.Logger:
+    """Resolve the per-agent logger once per agent name"""
+    return logging.getLogger(f"agents.{name.lower().replace(' ', '_')}")
+
 class BaseAgent(ABC):
     """Base class for all intelligence agents"""
     
+    # Names of agents whose output process() consumes; agents whose dependencies are
+    # all satisfied may be dispatched concurrently by the orchestrator
+    dependencies: FrozenSet[str] = frozenset()
+    
     def __init__(self, name: str, llm_provider: LLMProvider, system_prompt: str):
         self.name = name
         self.llm = llm_provider
         self.system_prompt = system_prompt
-        self.logger = logging.getLogger(f"agents.{name.lower().replace(' ', '_')}")
+        # Built once so every call sends a byte-identical, cacheable system prefix
+        self._cached_system = cacheable_system_blocks(system_prompt)
+        self._response_cache: "OrderedDict[str, str]" = OrderedDict()
+        # Context strings memoized by state fingerprint; contexts may be built in worker threads
+        self._context_cache: "OrderedDict[str, str]" = OrderedDict()
+        self._context_lock = threading.Lock()
+        self.logger = _get_logger(name)
     
     @abstractmethod
     async def process(self, state: InvestigationState) -> InvestigationState:
         """Process the current investigation state"""
         pass
     
-    async def generate_response(self, prompt: str, **kwargs) -> str:
+    async def generate_response(self, prompt: str, cacheable: bool = False, **kwargs) -> str:
         """Generate LLM response with error handling"""
+        # With cacheable=True an identical (system prompt, prompt, kwargs) request is
+        # answered from an in-memory LRU instead of another LLM round trip
+        cache_key = self._response_cache_key(prompt, kwargs) if cacheable else None
+        cached = self._cached_response(cache_key)
+        if cached is not None:
+            return cached
+        
         try:
-            response = await self.llm.generate(prompt, self.system_prompt, **kwargs)
+            response = await self.llm.generate(prompt, self._cached_system, **kwargs)
             self.logger.info(f"Generated response of length {len(response)}")
-            return response
         except Exception as e:
             self.logger.error(f"Error generating response: {e}")
             raise
+        
+        self._cache_response(cache_key, response)
+        return response
+    
+    async def generate_structured(
+        self, prompt: str, schema: Type[ModelT], cacheable: bool = False, **kwargs
+    ) -> ModelT:
+        """Generate a response validated against a Pydantic schema"""
+        # Providers with a JSON mode return the bare object; the rest wrap it in free text
+        response = await self.generate_response(prompt, cacheable=cacheable, response_schema=schema, **kwargs)
+        return await self.validate_structured(response, schema)
+    
+    async def validate_structured(self, response: str, schema: Type[ModelT]) -> ModelT:
+        """Validate a complete response against a Pydantic schema"""
+        try:
+            return schema.model_validate_json(response)
+        except ValidationError:
+            data = await extract_json_async(response)
+            if data is None:
+                raise ValueError(f"No JSON object found in {schema.__name__} response")
+            return schema.model_validate(data)
+    
+    async def generate_response_stream(self, prompt: str, cacheable: bool = False, **kwargs) -> AsyncIterator[str]:
+        """Stream LLM response chunks with error handling"""
+        cache_key = self._response_cache_key(prompt, kwargs) if cacheable else None
+        cached = self._cached_response(cache_key)
+        if cached is not None:
+            yield cached
+            return
+        
+        chunks = []
+        try:
+            async for chunk in self.llm.generate_stream(prompt, self._cached_system, **kwargs):
+                chunks.append(chunk)
+                yield chunk
+        except Exception as e:
+            self.logger.error(f"Error streaming response: {e}")
+            raise
+        
+        response = "".join(chunks)
+        self.logger.info(f"Streamed response of length {len(response)}")
+        self._cache_response(cache_key, response)
+    
+    def _cached_response(self, cache_key: Optional[str]) -> Optional[str]:
+        """Return a memoized response for cache_key, if any"""
+        if cache_key is None:
+            return None
+        cached = self._response_cache.get(cache_key)
+        if cached is not None:
+            self._response_cache.move_to_end(cache_key)
+            self.logger.info(f"Response cache hit ({len(cached)} chars)")
+        return cached
+    
+    def _cache_response(self, cache_key: Optional[str], response: str) -> None:
+        """Memoize a response, evicting the least recently used entry when full"""
+        if cache_key is None:
+            return
+        self._response_cache[cache_key] = response
+        if len(self._response_cache) > RESPONSE_CACHE_SIZE:
+            self._response_cache.popitem(last=False)
+    
+    def _cached_context(self, fingerprint: tuple, render: Callable[[], str]) -> str:
+        """Return the context rendered for an identical fingerprint, rendering it on a miss"""
+        key = self._context_key(fingerprint)
+        context = self._lookup_context(key)
+        if context is None:
+            context = render()
+            self._store_context(key, context)
+        return context
+    
+    async def _cached_context_async(self, fingerprint: tuple, render: Callable[[], Awaitable[str]]) -> str:
+        """_cached_context for renders that await work such as embeddings; only misses run them"""
+        key = self._context_key(fingerprint)
+        context = self._lookup_context(key)
+        if context is None:
+            context = await render()
+            self._store_context(key, context)
+        return context
+    
+    def _context_key(self, fingerprint: tuple) -> str:
+        """Hash a context fingerprint into a cache key"""
+        return hashlib.blake2b(repr(fingerprint).encode(), digest_size=16).hexdigest()
+    
+    def _lookup_context(self, key: str) -> Optional[str]:
+        """Return the memoized context for key, if any"""
+        with self._context_lock:
+            context = self._context_cache.get(key)
+            if context is not None:
+                self._context_cache.move_to_end(key)
+            return context
+    
+    def _store_context(self, key: str, context: str) -> None:
+        """Memoize a rendered context, evicting the least recently used one when full"""
+        with self._context_lock:
+            self._context_cache[key] = context
+            if len(self._context_cache) > CONTEXT_CACHE_SIZE:
+                self._context_cache.popitem(last=False)
+    
+    def _response_cache_key(self, prompt: str, kwargs: Dict[str, Any]) -> str:
+        """Hash everything that influences the LLM output into a cache key"""
+        key_material = f"{self.system_prompt}\x00{prompt}\x00{sorted(kwargs.items())}"
+        return hashlib.sha256(key_material.encode()).hexdigest()
     
     def create_agent_message(
         self, 
         message: str, 
         message_type: str = "info", 
         requires_response: bool = False,
-        metadata: Optional[Dict[str, Any]] = None
+        metadata: Optional[Dict[str, Any]] = None,
+        timestamp: Optional[datetime] = None
     ) -> AgentMessage:
         """Create a standardized agent message"""
         return AgentMessage(
             agent_name=self.name,
             message=message,
-            timestamp=datetime.now(),
+            timestamp=timestamp or datetime.now(),
             message_type=message_type,
             requires_response=requires_response,
-            metadata=metadata or {})
\ No newline at end of file
+            metadata=metadata if metadata is not None else _EMPTY_METADATA)
\ No newline at end of file
@@ -1,15 +1,33 @@
-import os, sys
-sys.path.append(os.getcwd())
 from agents.base_agent import BaseAgent
+from core.json_utils import JSONObjectStream, find_json_object, json_loads
 from models.schemas import InvestigationState, Evidence, EvidenceType
-from typing import List, Dict, Any
-import json
-import re
+from models.pivot_schemas import PivotAnalysis
+from pydantic import ValidationError
+from typing import List, Dict, Any, FrozenSet, Iterable, Mapping, Optional, Tuple
 from datetime import datetime
+from types import MappingProxyType
+import asyncio
+
+# Sections that must have streamed in before evidence can be published
+_EVIDENCE_SECTIONS = frozenset(("intelligence_value", "evidence_assessment"))
+
+# Read-only evidence metadata templates; every extracted item gets its own copy
+_PIVOT_METADATA: Mapping[str, Any] = MappingProxyType({"extracted_from": "pivot_analysis"})
+_REVELATION_METADATA: Mapping[str, Any] = MappingProxyType({"type": "revelation", "extracted_from": "pivot_analysis"})
+
+# Longest slice of any single context item sent to the LLM
+CONTEXT_ITEM_CHARS = 300
+
+def _clip_unique(items: Iterable[str]) -> List[str]:
+    """Clip context items to CONTEXT_ITEM_CHARS and drop duplicates, preserving order"""
+    return list(dict.fromkeys(item[:CONTEXT_ITEM_CHARS] for item in items))
 
 class PivotAgent(BaseAgent):
     """Agent responsible for analyzing responses and identifying new investigation angles"""
     
+    # Only needs the state and the user response, never another agent's output
+    dependencies: FrozenSet[str] = frozenset()
+    
     def __init__(self, llm_provider):
         system_prompt = """
         You are an expert intelligence analyst specializing in pivot analysis and strategic redirection.
@@ -34,8 +52,10 @@ class PivotAgent(BaseAgent):
     async def process(self, state: InvestigationState, user_response: str) -> InvestigationState:
         """Analyze user response and identify pivot opportunities"""
         self.logger.info("Analyzing response for pivot opportunities")
+        now = datetime.now()
         
         context = self._build_analysis_context(state, user_response)
+        published = False
         
         pivot_prompt = f"""
         Analyze this intelligence response and identify pivot opportunities:
@@ -74,39 +94,48 @@ class PivotAgent(BaseAgent):
         """
         
         try:
-            response = await self.generate_response(pivot_prompt)
-            analysis = await self._parse_pivot_analysis(response)
+            # Stream the analysis so evidence is built as soon as the sections it depends on
+            # have closed; it is only published once the whole response has parsed
+            stream = JSONObjectStream()
+            sections: Dict[str, Any] = {}
+            evidence_items = None
+            async for chunk in self.generate_response_stream(
+                pivot_prompt, cacheable=True, response_schema=PivotAnalysis
+            ):
+                sections.update(stream.feed(chunk))
+                if evidence_items is None and _EVIDENCE_SECTIONS.issubset(sections):
+                    evidence_items = self._evidence_from_analysis(sections, user_response, now)
+            
+            evidence_items, pivot_summary, credibility, new_angles, information_gaps = await self._analyze(
+                stream.text, user_response, now, evidence_items
+            )
             
-            # Extract and store evidence from the response
-            evidence_items = await self._extract_evidence(user_response, analysis)
-            state.evidence_pool.extend(evidence_items)
+            # Store evidence extracted from the response
+            state.add_evidence(evidence_items)
+            published = True
             
             # Update information gaps based on analysis
-            if analysis.get("pivot_opportunities", {}).get("information_gaps_identified"):
-                state.information_gaps.extend(
-                    analysis["pivot_opportunities"]["information_gaps_identified"]
-                )
+            if information_gaps:
+                state.add_information_gaps(information_gaps)
             
             # Update investigation focus if new angles identified
-            new_angles = analysis.get("pivot_opportunities", {}).get("new_investigation_angles", [])
             if new_angles:
                 state.investigation_focus = new_angles[:3]  # Top 3 new angles
             
             # Create pivot analysis message
-            pivot_summary = self._create_pivot_summary(analysis)
             message = self.create_agent_message(
                 f"Pivot analysis complete: {pivot_summary}",
                 message_type="analysis",
                 metadata={
-                    "credibility_score": analysis.get("intelligence_value", {}).get("credibility_score", 0.5),
+                    "credibility_score": credibility,
                     "new_angles_count": len(new_angles),
                     "evidence_extracted": len(evidence_items)
-                }
+                },
+                timestamp=now
             )
-            state.conversation_history.append(message)
+            state.add_message(message)
             
             # Update confidence score based on analysis
-            credibility = analysis.get("intelligence_value", {}).get("credibility_score", 0.5)
             state.confidence_score = min(1.0, state.confidence_score + (credibility * 0.1))
             
             self.logger.info(f"Pivot analysis complete. Found {len(new_angles)} new angles, extracted {len(evidence_items)} evidence items")
@@ -114,15 +143,72 @@ class PivotAgent(BaseAgent):
             
         except Exception as e:
             self.logger.error(f"Error in pivot analysis: {e}")
-            # Fallback: basic evidence extraction
-            return await self._fallback_pivot_analysis(state, user_response)
+            # Fallback: basic evidence extraction, unless the analysed evidence already landed
+            return self._fallback_pivot_analysis(state, user_response, record_evidence=not published)
+    
+    async def process_batch(
+        self,
+        items: List[Tuple[InvestigationState, str]],
+        max_concurrency: int = 8
+    ) -> List[InvestigationState]:
+        """Run pivot analysis over several (state, user_response) pairs concurrently"""
+        # process() mutates the state it is given, so every item must carry its own
+        # InvestigationState; sharing one state across items would interleave updates
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def analyze(state: InvestigationState, user_response: str) -> InvestigationState:
+            async with semaphore:
+                return await self.process(state, user_response)
+        
+        return await asyncio.gather(*(analyze(state, user_response) for state, user_response in items))
+    
+    async def _analyze(
+        self,
+        response: str,
+        user_response: str,
+        timestamp: datetime,
+        evidence_items: Optional[List[Evidence]] = None
+    ) -> Tuple[List[Evidence], str, float, List[str], List[str]]:
+        """Parse the pivot response and derive evidence, summary and scalars in one walk"""
+        try:
+            analysis = PivotAnalysis.model_validate_json(response).model_dump()
+        except ValidationError:
+            # Providers without structured output support wrap the JSON in free text; evidence
+            # built from the unvalidated stream may disagree with this parse, so it is rebuilt
+            analysis = await self._parse_pivot_analysis(response)
+            evidence_items = None
+        intelligence_value = analysis.get("intelligence_value", {})
+        pivot_opportunities = analysis.get("pivot_opportunities", {})
+        
+        credibility = intelligence_value.get("credibility_score", 0.5)
+        new_angles = pivot_opportunities.get("new_investigation_angles", [])
+        information_gaps = pivot_opportunities.get("information_gaps_identified", [])
+        
+        if evidence_items is None:
+            evidence_items = self._evidence_from_analysis(analysis, user_response, timestamp)
+        pivot_summary = self._create_pivot_summary(credibility, len(new_angles), len(information_gaps))
+        
+        return evidence_items, pivot_summary, credibility, new_angles, information_gaps
+    
+    def _evidence_from_analysis(
+        self, analysis: Dict[str, Any], user_response: str, timestamp: datetime
+    ) -> List[Evidence]:
+        """Build evidence from the intelligence_value and evidence_assessment sections"""
+        intelligence_value = analysis.get("intelligence_value") or {}
+        return self._extract_evidence(
+            user_response,
+            intelligence_value.get("credibility_score", 0.5),
+            (analysis.get("evidence_assessment") or {}).get("actionable_intelligence", []),
+            intelligence_value.get("key_revelations", []),
+            timestamp
+        )
     
     async def _parse_pivot_analysis(self, response: str) -> Dict[str, Any]:
-        """Parse the JSON response from pivot analysis"""
+        """Parse the JSON response from pivot analysis (legacy free-text path)"""
         try:
-            json_match = re.search(r'\{.*\}', response, re.DOTALL)
-            if json_match:
-                return json.loads(json_match.group())
+            payload = find_json_object(response)
+            if payload:
+                return json_loads(payload)
         except Exception as e:
             self.logger.error(f"Error parsing pivot analysis: {e}")
         
@@ -134,50 +220,48 @@ class PivotAgent(BaseAgent):
             "evidence_assessment": {"actionable_intelligence": [], "requires_verification": []}
         }
     
-    async def _extract_evidence(self, user_response: str, analysis: Dict[str, Any]) -> List[Evidence]:
+    def _extract_evidence(
+        self,
+        user_response: str,
+        credibility: float,
+        actionable_intel: List[str],
+        revelations: List[str],
+        timestamp: datetime
+    ) -> List[Evidence]:
         """Extract evidence items from user response based on analysis"""
-        evidence_items = []
+        # Fields shared by every item are validated once on a template; model_copy skips
+        # validation, so each item is given its own metadata dict
+        testimony = Evidence(
+            content="",
+            source="user_interview",
+            evidence_type=EvidenceType.TESTIMONY,
+            confidence_score=credibility,
+            timestamp=timestamp,
+            metadata=dict(_PIVOT_METADATA)
+        )
+        revelation = testimony.model_copy(update={"evidence_type": EvidenceType.INTELLIGENCE})
         
         # Extract actionable intelligence as evidence
-        actionable_intel = analysis.get("evidence_assessment", {}).get("actionable_intelligence", [])
-        for intel in actionable_intel:
-            evidence = Evidence(
-                content=intel,
-                source="user_interview",
-                evidence_type=EvidenceType.TESTIMONY,
-                confidence_score=analysis.get("intelligence_value", {}).get("credibility_score", 0.5),
-                timestamp=datetime.now(),
-                metadata={"extracted_from": "pivot_analysis"}
-            )
-            evidence_items.append(evidence)
+        evidence_items = [
+            testimony.model_copy(update={"content": str(intel), "metadata": dict(_PIVOT_METADATA)})
+            for intel in actionable_intel
+        ]
         
         # Extract key revelations as evidence
-        revelations = analysis.get("intelligence_value", {}).get("key_revelations", [])
-        for revelation in revelations:
-            evidence = Evidence(
-                content=revelation,
-                source="user_interview",
-                evidence_type=EvidenceType.INTELLIGENCE,
-                confidence_score=analysis.get("intelligence_value", {}).get("credibility_score", 0.5),
-                timestamp=datetime.now(),
-                metadata={"type": "revelation", "extracted_from": "pivot_analysis"}
-            )
-            evidence_items.append(evidence)
+        evidence_items += [
+            revelation.model_copy(update={"content": str(item), "metadata": dict(_REVELATION_METADATA)})
+            for item in revelations
+        ]
         
         return evidence_items
     
-    def _create_pivot_summary(self, analysis: Dict[str, Any]) -> str:
+    def _create_pivot_summary(self, credibility: float, new_angles: int, gaps: int) -> str:
         """Create a summary of the pivot analysis"""
-        summary_parts = []
-        
-        credibility = analysis.get("intelligence_value", {}).get("credibility_score", 0.5)
-        summary_parts.append(f"Credibility: {credibility:.1f}")
+        summary_parts = [f"Credibility: {credibility:.1f}"]
         
-        new_angles = len(analysis.get("pivot_opportunities", {}).get("new_investigation_angles", []))
         if new_angles > 0:
             summary_parts.append(f"{new_angles} new investigation angles identified")
         
-        gaps = len(analysis.get("pivot_opportunities", {}).get("information_gaps_identified", []))
         if gaps > 0:
             summary_parts.append(f"{gaps} information gaps identified")
         
@@ -194,40 +278,45 @@ class PivotAgent(BaseAgent):
         
         # Recent questions asked
         if state.current_questions:
-            context_parts.append(f"Recent Questions: {'; '.join(state.current_questions[-2:])}")
+            context_parts.append(f"Recent Questions: {'; '.join(_clip_unique(state.current_questions[-2:]))}")
         
         # Existing evidence
         if state.evidence_pool:
-            recent_evidence = [e.content for e in state.evidence_pool[-3:]]
+            recent_evidence = _clip_unique(e.content for e in state.evidence_pool[-3:])
             context_parts.append(f"Recent Evidence: {'; '.join(recent_evidence)}")
         
         # Current information gaps
         if state.information_gaps:
-            context_parts.append(f"Known Gaps: {'; '.join(state.information_gaps[-3:])}")
+            context_parts.append(f"Known Gaps: {'; '.join(_clip_unique(state.information_gaps[-3:]))}")
         
         return "\n".join(context_parts) if context_parts else "No prior context available."
     
-    async def _fallback_pivot_analysis(self, state: InvestigationState, user_response: str) -> InvestigationState:
+    def _fallback_pivot_analysis(
+        self, state: InvestigationState, user_response: str, record_evidence: bool = True
+    ) -> InvestigationState:
         """Fallback pivot analysis when main analysis fails"""
         self.logger.warning("Using fallback pivot analysis")
+        now = datetime.now()
         
         # Basic evidence extraction
-        evidence = Evidence(
-            content=user_response[:200] + "..." if len(user_response) > 200 else user_response,
-            source="user_interview",
-            evidence_type=EvidenceType.TESTIMONY,
-            confidence_score=0.6,
-            timestamp=datetime.now(),
-            metadata={"extraction_method": "fallback"}
-        )
-        state.evidence_pool.append(evidence)
+        if record_evidence:
+            evidence = Evidence(
+                content=user_response[:200] + "..." if len(user_response) > 200 else user_response,
+                source="user_interview",
+                evidence_type=EvidenceType.TESTIMONY,
+                confidence_score=0.6,
+                timestamp=now,
+                metadata={"extraction_method": "fallback"}
+            )
+            state.add_evidence([evidence])
         
         # Add basic analysis message
         message = self.create_agent_message(
             "Basic pivot analysis completed. Response recorded as evidence.",
             message_type="warning",
-            metadata={"fallback_used": True}
+            metadata={"fallback_used": True},
+            timestamp=now
         )
-        state.conversation_history.append(message)
+        state.add_message(message)
         
-        return state 
\ No newline at end of file
+        return state
\ No newline at end of file
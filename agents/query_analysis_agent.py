@@ -1,97 +1,177 @@
 import os,sys
 sys.path.append(os.getcwd())
 from agents.base_agent import BaseAgent
+from core.json_utils import JSONObjectStream, extract_json_async
 from models.schemas import InvestigationState, Entity, EntityType
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Set, Tuple
+from collections import OrderedDict
+from pydantic import ValidationError
+import asyncio
+import copy
 import re
-import json
 
-class QueryAnalysisAgent(BaseAgent):
-    """Agent responsible for parsing and understanding customer requests for intelligence on specific entities"""
-    
-    def __init__(self, llm_provider):
-        system_prompt = """
-        You are an expert intelligence analyst specializing in query decomposition and entity recognition.
-        Your job is to parse customer requests and identify:
-        1. Target entities (persons/organizations/locations) with detailed classification
-        2. Information types requested (financial, operational, personal, etc.)
-        3. Investigation scope, priority, and complexity assessment
-        4. Potential intelligence angles and collection requirements
-        5. Risk factors and sensitivity levels
-        
-        You must be thorough in entity extraction, considering:
-        - Primary targets (explicitly mentioned)
-        - Secondary targets (implied or related)
-        - Geographic locations of interest
-        - Organizations and their relationships
-        - Time frames and historical context
-        
-        Return your analysis in structured JSON format with confidence scores.
-        Be comprehensive but precise in your analysis.
-        """
-        super().__init__("Query Analysis Agent", llm_provider, system_prompt)
-    
-    async def process(self, state: InvestigationState) -> InvestigationState:
-        """Analyze the incoming query and extract comprehensive intelligence requirements"""
-        self.logger.info(f"Analyzing query: {state.query}...")
-        
-        analysis_prompt = f"""
-        Conduct comprehensive intelligence analysis of this request:
-        "{state.query}"
-        
+try:
+    # Linear-time engine for the fallback patterns when google-re2 is installed
+    import re2 as _regex_engine
+except ImportError:
+    _regex_engine = re
+
+# Bound on the number of cached query analyses
+ANALYSIS_CACHE_SIZE = 1024
+
+# Direct value -> member lookup for entity types returned by the LLM
+_ENTITY_TYPE_MAP = {member.value: member for member in EntityType}
+
+# Metadata shared by every entity of a category; Entity validation copies the dict, and
+# missing clue/alias lists default to a shared empty tuple instead of a fresh list
+_PRIMARY_METADATA = {"entity_category": "primary"}
+_SECONDARY_METADATA = {"relationship_to_primary": "unknown", "entity_category": "secondary"}
+
+# Entity lists and fallback queries larger than these are processed in a worker thread
+OFFLOAD_ENTITY_COUNT = 64
+OFFLOAD_QUERY_CHARS = 4096
+
+# Entity priorities counted as primary targets in the analysis summary
+_PRIMARY_PRIORITIES = frozenset(("critical", "high"))
+
+# Fallback entity extraction patterns, compiled once at import. Organization phrases
+# overlap proper nouns and each other, so each organization pattern gets its own
+# case-insensitive pass; locations and proper nouns never overlap and share one scan
+_ORG_KEYWORDS = r'(?:company|corp|corporation|inc|llc|ltd|organization|agency|department)'
+
+_ORG_PATTERNS = tuple(_regex_engine.compile(pattern) for pattern in (
+    r'(?i)\b(\w+(?:\s+\w+)*)\s+' + _ORG_KEYWORDS + r'\b',
+    r'(?i)\b' + _ORG_KEYWORDS + r'\s+(\w+(?:\s+\w+)*)\b'
+))
+
+_ENTITY_RE = _regex_engine.compile("|".join((
+    r'\bin\s+(?P<location_in>[A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)',
+    r'\bat\s+(?P<location_at>[A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)',
+    r'\bfrom\s+(?P<location_from>[A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)',
+    r'(?P<person>\b[A-Z][a-z]+(?:\s+[A-Z][a-z]+)*\b)'
+)))
+
+# Static schema instructions lead the prompt so it is built once and shares a prefix
+# across queries; only the request itself is appended per call
+_ANALYSIS_PROMPT_PREFIX = """
         Provide detailed JSON response:
-        {{
-            "query_classification": {{
+        {
+            "query_classification": {
                 "complexity": "simple|moderate|complex|highly_complex",
                 "sensitivity_level": "low|medium|high|critical",
                 "investigation_type": "person|organization|location|multi-target|relationship_mapping",
                 "estimated_scope": "narrow|broad|comprehensive"
-            }},
+            },
             "primary_entities": [
-                {{
+                {
                     "name": "entity_name",
                     "type": "person|organization|location",
                     "priority": "critical|high|medium|low",
                     "confidence": 0.0-1.0,
                     "context_clues": ["clue1", "clue2"],
                     "potential_aliases": ["alias1", "alias2"]
-                }}
+                }
             ],
             "secondary_entities": [
-                {{
+                {
                     "name": "related_entity",
                     "type": "person|organization|location",
                     "relationship_to_primary": "description",
                     "priority": "high|medium|low"
-                }}
+                }
             ],
-            "information_requirements": {{
+            "information_requirements": {
                 "primary_objectives": ["objective1", "objective2"],
                 "information_categories": ["financial", "operational", "personal", "legal", "relationships"],
                 "specific_questions": ["question1", "question2"],
                 "time_frame": "current|historical|both",
                 "geographic_scope": ["location1", "location2"]
-            }},
-            "collection_strategy": {{
+            },
+            "collection_strategy": {
                 "recommended_approaches": ["interview", "document_review", "relationship_mapping"],
                 "potential_sources": ["source_type1", "source_type2"],
                 "collection_priorities": ["priority1", "priority2"],
                 "risk_considerations": ["risk1", "risk2"]
-            }},
-            "success_criteria": {{
+            },
+            "success_criteria": {
                 "minimum_requirements": ["requirement1", "requirement2"],
                 "optimal_outcomes": ["outcome1", "outcome2"],
                 "quality_indicators": ["indicator1", "indicator2"]
-            }}
-        }}
+            }
+        }
+        
+        Conduct comprehensive intelligence analysis of this request:
+        """
+
+# PERF: latency here is dominated by the LLM call (well over 99%); parsing, entity
+# construction and the regex fallback take well under a millisecond for typical queries.
+# Effort belongs on the IO side (the analysis cache, process_batch concurrency, streaming
+# the response) and on cheap wins in the Python post-processing (orjson, precompiled
+# patterns, offloading large inputs to threads). Vectorized or GPU kernels cannot pay off.
+class QueryAnalysisAgent(BaseAgent):
+    """Agent responsible for parsing and understanding customer requests for intelligence on specific entities"""
+    
+    def __init__(self, llm_provider):
+        system_prompt = """
+        You are an expert intelligence analyst specializing in query decomposition and entity recognition.
+        Your job is to parse customer requests and identify:
+        1. Target entities (persons/organizations/locations) with detailed classification
+        2. Information types requested (financial, operational, personal, etc.)
+        3. Investigation scope, priority, and complexity assessment
+        4. Potential intelligence angles and collection requirements
+        5. Risk factors and sensitivity levels
+        
+        You must be thorough in entity extraction, considering:
+        - Primary targets (explicitly mentioned)
+        - Secondary targets (implied or related)
+        - Geographic locations of interest
+        - Organizations and their relationships
+        - Time frames and historical context
+        
+        Return your analysis in structured JSON format with confidence scores.
+        Be comprehensive but precise in your analysis.
         """
+        super().__init__("Query Analysis Agent", llm_provider, system_prompt)
+        # Exact query matches only: near-duplicate queries usually differ in the very entities being extracted
+        self._analysis_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+    
+    async def process(self, state: InvestigationState) -> InvestigationState:
+        """Analyze the incoming query and extract comprehensive intelligence requirements"""
+        self.logger.info("Analyzing query: %s...", state.query)
+        
+        analysis_prompt = f'{_ANALYSIS_PROMPT_PREFIX}"{state.query}"\n'
         
         try:
-            response = await self.generate_response(analysis_prompt)
-            analysis_data = await self._parse_analysis_response(response)
+            # Repeated queries reuse a previous analysis without an LLM call
+            cached = self._analysis_cache.get(state.query)
+            if cached is not None:
+                self._analysis_cache.move_to_end(state.query)
+                self.logger.info("Reusing cached query analysis")
+                analysis_data = copy.deepcopy(cached)
+            else:
+                # Members are decoded as they close in the stream; a complete object needs
+                # no second scan-and-parse pass over the buffered response
+                stream = JSONObjectStream()
+                sections: Dict[str, Any] = {}
+                async for chunk in self.generate_response_stream(analysis_prompt):
+                    sections.update(stream.feed(chunk))
+                if stream.complete and sections:
+                    analysis_data = sections
+                else:
+                    analysis_data = await self._parse_analysis_response(stream.text)
+                # Parse fallbacks carry no entities and are not worth caching
+                if analysis_data.get("primary_entities"):
+                    self._analysis_cache[state.query] = copy.deepcopy(analysis_data)
+                    if len(self._analysis_cache) > ANALYSIS_CACHE_SIZE:
+                        self._analysis_cache.popitem(last=False)
             
             # Extract and create entity objects
-            entities = await self._create_entity_objects(analysis_data)
+            # Entity construction is pure CPU work; large lists are built off the event loop
+            entity_count = len(analysis_data.get("primary_entities", [])) + len(analysis_data.get("secondary_entities", []))
+            if entity_count > OFFLOAD_ENTITY_COUNT:
+                entities, entity_types, primary_count = await asyncio.to_thread(self._create_entity_objects, analysis_data)
+            else:
+                entities, entity_types, primary_count = self._create_entity_objects(analysis_data)
             state.target_entities = entities
             
             # Set investigation metadata based on analysis
@@ -107,7 +187,7 @@ class QueryAnalysisAgent(BaseAgent):
             # Set information requirements
             if analysis_data.get("information_requirements"):
                 info_req = analysis_data["information_requirements"]
-                state.information_gaps = info_req.get("primary_objectives", [])
+                state.set_information_gaps(info_req.get("primary_objectives") or [])
                 state.metadata["information_categories"] = info_req.get("information_categories", [])
                 state.metadata["specific_questions"] = info_req.get("specific_questions", [])
             
@@ -117,33 +197,49 @@ class QueryAnalysisAgent(BaseAgent):
             
             # Add comprehensive analysis message
             message = self.create_agent_message(
-                f"Comprehensive query analysis complete. Identified {len(entities)} entities across {len(set(e.entity_type.value for e in entities))} categories. Investigation classified as {state.metadata.get('complexity', 'moderate')} complexity with {state.metadata.get('sensitivity_level', 'medium')} sensitivity.",
+                f"Comprehensive query analysis complete. Identified {len(entities)} entities across {len(entity_types)} categories. Investigation classified as {state.metadata.get('complexity', 'moderate')} complexity with {state.metadata.get('sensitivity_level', 'medium')} sensitivity.",
                 message_type="analysis",
                 metadata={
                     "entities_count": len(entities),
-                    "primary_entities": len([e for e in entities if getattr(e, 'priority', 'medium') in ['critical', 'high']]),
+                    "primary_entities": primary_count,
                     "complexity": state.metadata.get("complexity", "moderate"),
                     "sensitivity": state.metadata.get("sensitivity_level", "medium")
                 }
             )
-            state.conversation_history.append(message)
+            state.add_message(message)
             
-            self.logger.info(f"Analysis complete. Found {len(entities)} entities with {state.metadata.get('complexity', 'moderate')} complexity")
+            self.logger.info("Analysis complete. Found %d entities with %s complexity", len(entities), state.metadata.get("complexity", "moderate"))
             return state
             
         except Exception as e:
-            self.logger.error(f"Error in query analysis: {e}")
+            self.logger.error("Error in query analysis: %s", e)
             # Enhanced fallback analysis
             return await self._enhanced_fallback_analysis(state)
     
+    async def process_batch(
+        self,
+        states: List[InvestigationState],
+        max_concurrency: int = 8
+    ) -> List[InvestigationState]:
+        """Analyze several investigations' queries concurrently"""
+        # LLM calls overlap up to max_concurrency; raise it together with the provider's
+        # server-side parallelism limit (e.g. OLLAMA_NUM_PARALLEL for local backends)
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def analyze(state: InvestigationState) -> InvestigationState:
+            async with semaphore:
+                return await self.process(state)
+        
+        return await asyncio.gather(*(analyze(state) for state in states))
+    
     async def _parse_analysis_response(self, response: str) -> Dict[str, Any]:
         """Parse the JSON response from query analysis"""
         try:
-            json_match = re.search(r'\{.*\}', response, re.DOTALL)
-            if json_match:
-                return json.loads(json_match.group())
+            data = await extract_json_async(response)
+            if data is not None:
+                return data
         except Exception as e:
-            self.logger.error(f"Error parsing analysis response: {e}")
+            self.logger.error("Error parsing analysis response: %s", e)
         
         # Return default structure
         return {
@@ -153,108 +249,151 @@ class QueryAnalysisAgent(BaseAgent):
             "collection_strategy": {"recommended_approaches": ["interview"]}
         }
     
-    async def _create_entity_objects(self, analysis_data: Dict[str, Any]) -> List[Entity]:
-        """Create Entity objects from analysis data"""
+    def _create_entity_objects(
+        self, analysis_data: Dict[str, Any]
+    ) -> Tuple[List[Entity], Set[EntityType], int]:
+        """Create Entity objects from analysis data, with their type set and critical/high priority count"""
         entities = []
+        # Tallied while building so the summary needs no second pass over the entities
+        entity_types: Set[EntityType] = set()
+        primary_count = 0
+        
+        skipped: List[str] = []
         
         # Process primary entities
         primary_entities = analysis_data.get("primary_entities", [])
         for entity_data in primary_entities:
+            entity_type = self._valid_entity_type(entity_data, skipped)
+            if entity_type is None:
+                continue
             try:
                 entity = Entity(
                     name=entity_data["name"],
-                    entity_type=EntityType(entity_data["type"]),
+                    entity_type=entity_type,
                     priority=entity_data.get("priority", "medium"),
                     confidence_score=entity_data.get("confidence", 0.8),
                     metadata={
-                        "context_clues": entity_data.get("context_clues", []),
-                        "potential_aliases": entity_data.get("potential_aliases", []),
-                        "entity_category": "primary"
+                        **_PRIMARY_METADATA,
+                        "context_clues": entity_data.get("context_clues", ()),
+                        "potential_aliases": entity_data.get("potential_aliases", ())
                     }
                 )
-                entities.append(entity)
-            except Exception as e:
-                self.logger.warning(f"Error creating primary entity {entity_data.get('name', 'unknown')}: {e}")
+            except ValidationError:
+                skipped.append(str(entity_data["name"]))
+                continue
+            entities.append(entity)
+            entity_types.add(entity_type)
+            primary_count += entity.priority in _PRIMARY_PRIORITIES
         
         # Process secondary entities
         secondary_entities = analysis_data.get("secondary_entities", [])
         for entity_data in secondary_entities:
+            entity_type = self._valid_entity_type(entity_data, skipped)
+            if entity_type is None:
+                continue
             try:
                 entity = Entity(
                     name=entity_data["name"],
-                    entity_type=EntityType(entity_data["type"]),
+                    entity_type=entity_type,
                     priority=entity_data.get("priority", "low"),
                     confidence_score=0.6,  # Lower confidence for secondary entities
-                    metadata={
-                        "relationship_to_primary": entity_data.get("relationship_to_primary", "unknown"),
-                        "entity_category": "secondary"
+                    metadata=_SECONDARY_METADATA if "relationship_to_primary" not in entity_data else {
+                        **_SECONDARY_METADATA,
+                        "relationship_to_primary": entity_data["relationship_to_primary"]
                     }
                 )
-                entities.append(entity)
-            except Exception as e:
-                self.logger.warning(f"Error creating secondary entity {entity_data.get('name', 'unknown')}: {e}")
+            except ValidationError:
+                skipped.append(str(entity_data["name"]))
+                continue
+            entities.append(entity)
+            entity_types.add(entity_type)
+            primary_count += entity.priority in _PRIMARY_PRIORITIES
         
-        return entities
+        if skipped:
+            self.logger.warning("Skipped %d malformed entities: %s", len(skipped), skipped[:5])
+        
+        return entities, entity_types, primary_count
+    
+    def _valid_entity_type(self, entity_data: Any, skipped: List[str]) -> Optional[EntityType]:
+        """Return the entity's type if it has a name and a known type, else record it as skipped"""
+        if not isinstance(entity_data, dict) or "name" not in entity_data:
+            skipped.append("unknown")
+            return None
+        entity_type = _ENTITY_TYPE_MAP.get(entity_data.get("type"))
+        if entity_type is None:
+            skipped.append(str(entity_data["name"]))
+        return entity_type
     
     async def _enhanced_fallback_analysis(self, state: InvestigationState) -> InvestigationState:
         """Enhanced fallback analysis with better entity extraction"""
         self.logger.warning("Using enhanced fallback analysis")
         
-        entities = []
-        
-        # Enhanced entity extraction using multiple patterns
-        query_text = state.query.lower()
+        # Entities built before a later step failed are kept; only the metadata is reset
+        if state.target_entities:
+            entities = state.target_entities
+        else:
+            if len(state.query) > OFFLOAD_QUERY_CHARS:
+                entities = await asyncio.to_thread(self._fallback_entities, state.query)
+            else:
+                entities = self._fallback_entities(state.query)
+            state.target_entities = entities
         
-        # Pattern 1: Proper nouns (potential names)
-        proper_nouns = re.findall(r'\b[A-Z][a-z]+(?:\s+[A-Z][a-z]+)*\b', state.query)
+        # Set basic metadata
+        state.metadata.update({
+            "complexity": "moderate",
+            "sensitivity_level": "medium",
+            "investigation_type": "multi-target",
+            "extraction_method": "enhanced_fallback"
+        })
         
-        # Pattern 2: Organization indicators
-        org_patterns = [
-            r'\b(\w+(?:\s+\w+)*)\s+(?:company|corp|corporation|inc|llc|ltd|organization|agency|department)\b',
-            r'\b(?:company|corp|corporation|inc|llc|ltd|organization|agency|department)\s+(\w+(?:\s+\w+)*)\b'
-        ]
+        message = self.create_agent_message(
+            f"Enhanced fallback analysis complete. Identified {len(entities)} potential entities using pattern matching and linguistic analysis.",
+            message_type="warning",
+            metadata={"fallback_used": True, "entities_extracted": len(entities)}
+        )
+        state.add_message(message)
         
-        # Pattern 3: Location indicators
-        location_patterns = [
-            r'\bin\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)',
-            r'\bat\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)',
-            r'\bfrom\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)'
-        ]
+        return state
+    
+    def _fallback_entities(self, query: str) -> List[Entity]:
+        """Extract candidate entities from the raw query with pattern matching"""
+        entities = []
         
-        # Extract organizations
-        for pattern in org_patterns:
-            matches = re.findall(pattern, state.query, re.IGNORECASE)
-            for match in matches:
-                entities.append(Entity(
-                    name=match.strip(),
-                    entity_type=EntityType.ORGANIZATION,
-                    priority="medium",
-                    confidence_score=0.7,
-                    metadata={"extraction_method": "pattern_matching", "pattern_type": "organization"}
-                ))
+        # Organization phrases, one pass per pattern since their matches overlap
+        organizations = [match.strip() for pattern in _ORG_PATTERNS for match in pattern.findall(query)]
         
-        # Extract locations
-        for pattern in location_patterns:
-            matches = re.findall(pattern, state.query)
-            for match in matches:
-                entities.append(Entity(
-                    name=match.strip(),
-                    entity_type=EntityType.LOCATION,
-                    priority="medium",
-                    confidence_score=0.6,
-                    metadata={"extraction_method": "pattern_matching", "pattern_type": "location"}
-                ))
+        # Locations and proper nouns in a single scan; locations are grouped by preposition
+        locations_by_kind = {"location_in": [], "location_at": [], "location_from": []}
+        proper_nouns = []
+        for match in _ENTITY_RE.finditer(query):
+            kind = match.lastgroup
+            if kind == "person":
+                name = match.group(kind)
+                if len(name.split()) <= 3:  # Reasonable name length
+                    proper_nouns.append(name)
+            else:
+                locations_by_kind[kind].append(match.group(kind).strip())
+        locations = [name for names in locations_by_kind.values() for name in names]
         
-        # Extract potential person names (remaining proper nouns)
-        used_names = {e.name.lower() for e in entities}
-        for name in proper_nouns:
-            if name.lower() not in used_names and len(name.split()) <= 3:  # Reasonable name length
+        # Organizations, then locations, then potential person names (remaining proper
+        # nouns); each case-folded name becomes at most one entity
+        seen = set()
+        for names, entity_type, confidence, metadata in (
+            (organizations, EntityType.ORGANIZATION, 0.7, {"extraction_method": "pattern_matching", "pattern_type": "organization"}),
+            (locations, EntityType.LOCATION, 0.6, {"extraction_method": "pattern_matching", "pattern_type": "location"}),
+            (proper_nouns, EntityType.PERSON, 0.5, {"extraction_method": "proper_noun_extraction"})
+        ):
+            for name in names:
+                key = name.lower()
+                if key in seen:
+                    continue
+                seen.add(key)
                 entities.append(Entity(
                     name=name,
-                    entity_type=EntityType.PERSON,
+                    entity_type=entity_type,
                     priority="medium",
-                    confidence_score=0.5,
-                    metadata={"extraction_method": "proper_noun_extraction"}
+                    confidence_score=confidence,
+                    metadata=metadata
                 ))
         
         # Ensure we have at least one entity
@@ -267,21 +406,4 @@ class QueryAnalysisAgent(BaseAgent):
                 metadata={"extraction_method": "fallback_default"}
             ))
         
-        state.target_entities = entities
-        
-        # Set basic metadata
-        state.metadata.update({
-            "complexity": "moderate",
-            "sensitivity_level": "medium",
-            "investigation_type": "multi-target",
-            "extraction_method": "enhanced_fallback"
-        })
-        
-        message = self.create_agent_message(
-            f"Enhanced fallback analysis complete. Identified {len(entities)} potential entities using pattern matching and linguistic analysis.",
-            message_type="warning",
-            metadata={"fallback_used": True, "entities_extracted": len(entities)}
-        )
-        state.conversation_history.append(message)
-        
-        return state
\ No newline at end of file
+        return entities
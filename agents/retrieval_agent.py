@@ -1,10 +1,150 @@
 import os, sys
 sys.path.append(os.getcwd())
-from agents.base_agent import BaseAgent
-from models.schemas import InvestigationState
-from typing import List, Dict, Any
-import re
-import json
+from agents.base_agent import BaseAgent, ModelT
+from core.json_utils import JSONObjectStream, extract_json_async, extract_partial_json, json_dumps
+from services.embeddings import run_in_embedding_pool
+from services.semantic_cache import SemanticCache
+from models.schemas import InvestigationState, EntityType
+from models.retrieval_schemas import QuestionAdaptation, QuestionFormulation
+from pydantic import BaseModel
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Mapping, NamedTuple, Optional, Tuple, Type
+from functools import lru_cache
+from itertools import chain, islice, starmap
+from types import MappingProxyType
+import asyncio
+import operator
+
+# Minimum context similarity for reusing parsed questions within the same entities and gaps,
+# and the bound on each cache
+QUESTION_CACHE_THRESHOLD = 0.95
+QUESTION_CACHE_SIZE = 256
+
+# Entity fields read when rendering and fingerprinting the question context, fetched in one call
+_ENTITY_FIELDS = operator.attrgetter("name", "entity_type", "priority", "confidence_score")
+
+@lru_cache(maxsize=1024)
+def _entity_fragment(name: str, entity_type: EntityType, priority: str, confidence: float) -> str:
+    """Render one target entity for the question context; entities recur across turns"""
+    return f"{name} ({entity_type.value}) [Priority: {priority}, Confidence: {confidence:.1f}]"
+
+class _QuestionMetadata(NamedTuple):
+    """Investigation metadata read by the question context, looked up once per build"""
+    has_plan: bool
+    current_phase: str
+    current_objectives: Tuple[str, ...]
+    interview_approach: Optional[str]
+    recent_question_sets: int
+    sensitivity_factors: Tuple[str, ...]
+
+def _question_metadata_view(metadata: Dict[str, Any]) -> _QuestionMetadata:
+    """Snapshot the metadata fields the question context depends on"""
+    plan = metadata.get("strategic_plan")
+    interview = plan.get("interview_strategy") if plan else None
+    tactical = metadata.get("tactical_considerations")
+    return _QuestionMetadata(
+        has_plan=bool(plan),
+        current_phase=metadata.get("current_phase", "immediate"),
+        current_objectives=tuple(metadata.get("current_objectives") or ()),
+        interview_approach=interview.get("questioning_approach", "adaptive") if interview else None,
+        recent_question_sets=min(metadata.get("question_message_count", 0), 2),  # Last 2 question sets
+        sensitivity_factors=tuple((tactical.get("sensitivity_factors") or ())[:3]) if tactical else ()
+    )
+
+# Shared read-only default for missing response sections
+_EMPTY: Mapping[str, Any] = MappingProxyType({})
+
+# Questions put to the interviewer per turn
+QUESTIONS_PER_TURN = 4
+
+# Question priority levels in ask order; unknown priorities rank as medium
+_PRIORITY_ORDER = {"critical": 0, "high": 1, "medium": 2, "low": 3}
+
+# Lead-in shown above the questions for each questioning phase
+_PHASE_PREFIX = {
+    "opening": "Let me start by understanding the basics:",
+    "development": "Now I'd like to explore some key areas in more detail:",
+    "probing": "I need to probe deeper into some specific aspects:",
+    "verification": "Let me verify some important details:"
+}
+
+def _has_enough_questions(sections: Dict[str, Any]) -> bool:
+    """Whether streamed sections already hold the strategy and a full turn of questions"""
+    # Later sections (questioning sequence, tactical considerations) are only fallbacks
+    # and hints, so the stream can stop once the question list has closed
+    questions = sections.get("questions")
+    if "question_strategy" not in sections or not isinstance(questions, list):
+        return False
+    asked = sum(1 for item in questions if isinstance(item, dict) and item.get("question_text"))
+    return asked >= QUESTIONS_PER_TURN
+
+# Static instructions and schema lead each prompt so providers can cache the shared
+# prefix; the per-call context is appended last
+_QUESTION_PROMPT_PREFIX = """
+        Formulate strategic questions based on the comprehensive investigation context below.
+        
+        Generate questions in JSON format:
+        {
+            "question_strategy": {
+                "primary_approach": "direct|indirect|layered|verification|exploration",
+                "questioning_phase": "opening|development|probing|verification|closing",
+                "rapport_level": "building|established|challenging|recovery",
+                "information_priority": "critical|high|medium|exploratory"
+            },
+            "questions": [
+                {
+                    "question_text": "The actual question to ask",
+                    "question_type": "open_ended|closed|hypothetical|timeline|relationship|verification",
+                    "strategic_purpose": "What this question aims to achieve",
+                    "expected_information": "Type of information expected",
+                    "priority": "critical|high|medium|low",
+                    "follow_up_potential": "high|medium|low"
+                }
+            ],
+            "questioning_sequence": {
+                "opening_questions": ["question1", "question2"],
+                "core_questions": ["question1", "question2"],
+                "verification_questions": ["question1", "question2"],
+                "expansion_questions": ["question1", "question2"]
+            },
+            "tactical_considerations": {
+                "sensitivity_factors": ["factor1", "factor2"],
+                "potential_resistance_points": ["point1", "point2"],
+                "rapport_maintenance": ["technique1", "technique2"],
+                "pivot_opportunities": ["opportunity1", "opportunity2"]
+            }
+        }
+        
+        INVESTIGATION CONTEXT:
+        """
+
+_ADAPTATION_PROMPT_PREFIX = """
+        Adapt questioning strategy based on the pivot analysis below.
+        
+        Generate adapted questions in JSON format:
+        {
+            "adaptation_strategy": {
+                "pivot_response": "expand|focus|verify|redirect|probe_deeper",
+                "new_priorities": ["priority1", "priority2"],
+                "questioning_adjustments": ["adjustment1", "adjustment2"],
+                "tactical_shifts": ["shift1", "shift2"]
+            },
+            "adapted_questions": [
+                {
+                    "question_text": "Adapted question based on pivot analysis",
+                    "adaptation_reason": "Why this question was chosen based on pivot",
+                    "expected_intelligence": "What intelligence this should yield",
+                    "priority": "critical|high|medium|low"
+                }
+            ],
+            "follow_up_strategy": {
+                "immediate_follow_ups": ["follow_up1", "follow_up2"],
+                "contingent_questions": ["contingent1", "contingent2"],
+                "verification_needs": ["verification1", "verification2"]
+            }
+        }
+        
+        PIVOT ANALYSIS CONTEXT:
+        """
 
 class RetrievalAgent(BaseAgent):
     """Agent responsible for formulating targeted questions to gather specific evidence from the interviewer"""
@@ -38,6 +178,9 @@ class RetrievalAgent(BaseAgent):
         Ask 2-4 focused questions at a time, prioritized by strategic importance.
         """
         super().__init__("Retrieval Agent", llm_provider, system_prompt)
+        # Parsed responses keyed by the context that produced them
+        self._question_cache = SemanticCache(QUESTION_CACHE_THRESHOLD, max_entries=QUESTION_CACHE_SIZE)
+        self._adaptation_cache = SemanticCache(QUESTION_CACHE_THRESHOLD, max_entries=QUESTION_CACHE_SIZE)
     
     async def process(self, state: InvestigationState) -> InvestigationState:
         """Generate targeted questions based on current intelligence gaps and strategic plan"""
@@ -45,60 +188,28 @@ class RetrievalAgent(BaseAgent):
         
         context = self._build_comprehensive_context(state)
         
-        question_prompt = f"""
-        Formulate strategic questions based on the comprehensive investigation context:
-        
-        INVESTIGATION CONTEXT:
-        {context}
-        
-        Generate questions in JSON format:
-        {{
-            "question_strategy": {{
-                "primary_approach": "direct|indirect|layered|verification|exploration",
-                "questioning_phase": "opening|development|probing|verification|closing",
-                "rapport_level": "building|established|challenging|recovery",
-                "information_priority": "critical|high|medium|exploratory"
-            }},
-            "questions": [
-                {{
-                    "question_text": "The actual question to ask",
-                    "question_type": "open_ended|closed|hypothetical|timeline|relationship|verification",
-                    "strategic_purpose": "What this question aims to achieve",
-                    "expected_information": "Type of information expected",
-                    "priority": "critical|high|medium|low",
-                    "follow_up_potential": "high|medium|low"
-                }}
-            ],
-            "questioning_sequence": {{
-                "opening_questions": ["question1", "question2"],
-                "core_questions": ["question1", "question2"],
-                "verification_questions": ["question1", "question2"],
-                "expansion_questions": ["question1", "question2"]
-            }},
-            "tactical_considerations": {{
-                "sensitivity_factors": ["factor1", "factor2"],
-                "potential_resistance_points": ["point1", "point2"],
-                "rapport_maintenance": ["technique1", "technique2"],
-                "pivot_opportunities": ["opportunity1", "opportunity2"]
-            }}
-        }}
-        """
+        question_prompt = _QUESTION_PROMPT_PREFIX + context
         
         try:
-            response = await self.generate_response(question_prompt)
-            question_data = await self._parse_question_response(response)
+            question_data = await self._cached_generate(
+                self._question_cache, self._cache_scope(state), context, question_prompt,
+                self._parse_question_response, QuestionFormulation, "questions", stop_when=_has_enough_questions
+            )
             
             # Extract questions based on strategic priority
             questions = self._prioritize_and_format_questions(question_data)
             state.current_questions = questions
+            strategy = question_data.question_strategy
+            approach = strategy.primary_approach
+            sections = question_data.model_fields_set
             
             # Store questioning strategy in metadata
-            if question_data.get("question_strategy"):
-                state.metadata["current_questioning_strategy"] = question_data["question_strategy"]
+            if "question_strategy" in sections:
+                state.metadata["current_questioning_strategy"] = strategy.model_dump()
             
             # Store tactical considerations
-            if question_data.get("tactical_considerations"):
-                state.metadata["tactical_considerations"] = question_data["tactical_considerations"]
+            if "tactical_considerations" in sections:
+                state.metadata["tactical_considerations"] = question_data.tactical_considerations.model_dump()
             
             # Create comprehensive message for conversation
             questions_text = self._format_questions_for_display(questions, question_data)
@@ -108,14 +219,15 @@ class RetrievalAgent(BaseAgent):
                 requires_response=True,
                 metadata={
                     "question_count": len(questions),
-                    "questioning_approach": question_data.get("question_strategy", {}).get("primary_approach", "adaptive"),
-                    "priority_level": question_data.get("question_strategy", {}).get("information_priority", "medium"),
-                    "phase": question_data.get("question_strategy", {}).get("questioning_phase", "development")
+                    "questioning_approach": approach,
+                    "priority_level": strategy.information_priority,
+                    "phase": strategy.questioning_phase
                 }
             )
-            state.conversation_history.append(message)
+            state.add_message(message)
+            self._count_question_message(state)
             
-            self.logger.info(f"Formulated {len(questions)} strategic questions with {question_data.get('question_strategy', {}).get('primary_approach', 'adaptive')} approach")
+            self.logger.info(f"Formulated {len(questions)} strategic questions with {approach} approach")
             return state
             
         except Exception as e:
@@ -123,53 +235,43 @@ class RetrievalAgent(BaseAgent):
             # Enhanced fallback questioning
             return await self._enhanced_fallback_questioning(state)
     
+    async def process_batch(
+        self,
+        states: List[InvestigationState],
+        max_concurrency: int = 8
+    ) -> List[InvestigationState]:
+        """Formulate questions for several investigations concurrently"""
+        # Each state is mutated by process(), so states must not be shared between items
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def formulate(state: InvestigationState) -> InvestigationState:
+            async with semaphore:
+                return await self.process(state)
+        
+        return await asyncio.gather(*(formulate(state) for state in states))
+    
     async def adapt_questions_from_pivot(self, state: InvestigationState, pivot_analysis: Dict[str, Any]) -> InvestigationState:
         """Adapt questioning strategy based on pivot agent analysis"""
         self.logger.info("Adapting questions based on pivot analysis")
         
         context = self._build_pivot_adaptation_context(state, pivot_analysis)
         
-        adaptation_prompt = f"""
-        Adapt questioning strategy based on pivot analysis:
-        
-        PIVOT ANALYSIS CONTEXT:
-        {context}
-        
-        Generate adapted questions in JSON format:
-        {{
-            "adaptation_strategy": {{
-                "pivot_response": "expand|focus|verify|redirect|probe_deeper",
-                "new_priorities": ["priority1", "priority2"],
-                "questioning_adjustments": ["adjustment1", "adjustment2"],
-                "tactical_shifts": ["shift1", "shift2"]
-            }},
-            "adapted_questions": [
-                {{
-                    "question_text": "Adapted question based on pivot analysis",
-                    "adaptation_reason": "Why this question was chosen based on pivot",
-                    "expected_intelligence": "What intelligence this should yield",
-                    "priority": "critical|high|medium|low"
-                }}
-            ],
-            "follow_up_strategy": {{
-                "immediate_follow_ups": ["follow_up1", "follow_up2"],
-                "contingent_questions": ["contingent1", "contingent2"],
-                "verification_needs": ["verification1", "verification2"]
-            }}
-        }}
-        """
+        adaptation_prompt = _ADAPTATION_PROMPT_PREFIX + context
         
         try:
-            response = await self.generate_response(adaptation_prompt)
-            adaptation_data = await self._parse_adaptation_response(response)
+            adaptation_data = await self._cached_generate(
+                self._adaptation_cache, self._cache_scope(state), context, adaptation_prompt,
+                self._parse_adaptation_response, QuestionAdaptation, "adapted_questions"
+            )
             
             # Update questions based on adaptation
             adapted_questions = self._extract_adapted_questions(adaptation_data)
             state.current_questions = adapted_questions
             
             # Update questioning strategy
-            if adaptation_data.get("adaptation_strategy"):
-                state.metadata["questioning_adaptation"] = adaptation_data["adaptation_strategy"]
+            adaptation_strategy = adaptation_data.adaptation_strategy
+            if "adaptation_strategy" in adaptation_data.model_fields_set:
+                state.metadata["questioning_adaptation"] = adaptation_strategy.model_dump()
             
             # Create adaptation message
             adaptation_summary = self._create_adaptation_summary(adaptation_data)
@@ -177,12 +279,12 @@ class RetrievalAgent(BaseAgent):
                 f"Questions adapted based on pivot analysis: {adaptation_summary}",
                 message_type="adaptation",
                 metadata={
-                    "adaptation_type": adaptation_data.get("adaptation_strategy", {}).get("pivot_response", "expand"),
+                    "adaptation_type": adaptation_strategy.pivot_response,
                     "new_questions_count": len(adapted_questions),
                     "pivot_triggered": True
                 }
             )
-            state.conversation_history.append(message)
+            state.add_message(message)
             
             return state
             
@@ -190,32 +292,102 @@ class RetrievalAgent(BaseAgent):
             self.logger.error(f"Error adapting questions from pivot: {e}")
             return state
     
+    async def _cached_generate(
+        self,
+        cache: SemanticCache,
+        scope: str,
+        context: str,
+        prompt: str,
+        parse: Callable[[str], Awaitable[Dict[str, Any]]],
+        schema: Type[ModelT],
+        required_key: str,
+        stop_when: Optional[Callable[[Dict[str, Any]], bool]] = None
+    ) -> ModelT:
+        """Return the typed response for an exact or near-duplicate context, generating it on a miss"""
+        cached = await run_in_embedding_pool(cache.get, context, scope)
+        if cached is not None:
+            self.logger.info("Reusing cached questioning response")
+            return cached.model_copy(deep=True)
+        
+        data = schema.model_validate(await self._stream_and_parse(prompt, parse, schema, stop_when))
+        # Parse fallbacks carry no questions and are not worth caching
+        if getattr(data, required_key):
+            await run_in_embedding_pool(cache.put, context, data.model_copy(deep=True), scope)
+        return data
+    
+    async def _stream_and_parse(
+        self,
+        prompt: str,
+        parse: Callable[[str], Awaitable[Dict[str, Any]]],
+        schema: Type[BaseModel],
+        stop_when: Optional[Callable[[Dict[str, Any]], bool]] = None
+    ) -> Dict[str, Any]:
+        """Stream a response, decoding its top-level sections as they close"""
+        stream = JSONObjectStream()
+        sections: Dict[str, Any] = {}
+        chunks = self.generate_response_stream(prompt, response_schema=schema)
+        try:
+            async for chunk in chunks:
+                sections.update(stream.feed(chunk))
+                if stop_when is not None and stop_when(sections):
+                    self.logger.info("Enough sections received; ending response stream early")
+                    return sections
+        finally:
+            await chunks.aclose()
+        
+        # A complete object was already decoded member by member; anything else is reparsed
+        if stream.complete and sections:
+            return sections
+        return await parse(stream.text)
+    
+    def _count_question_message(self, state: InvestigationState) -> None:
+        """Track question messages so context building never scans the conversation history"""
+        state.metadata["question_message_count"] = state.metadata.get("question_message_count", 0) + 1
+    
+    def _cache_scope(self, state: InvestigationState) -> str:
+        """Exact-match part of the question cache key: questions never carry over to other targets or gaps"""
+        return json_dumps([sorted(entity.name for entity in state.target_entities), state.information_gaps])
+    
     def _build_comprehensive_context(self, state: InvestigationState) -> str:
         """Build comprehensive context for question formulation"""
+        view = _question_metadata_view(state.metadata)
+        entity_fields = tuple(map(_ENTITY_FIELDS, state.target_entities))
+        evidence_pool = state.evidence_pool
+        last_evidence = evidence_pool[-1] if evidence_pool else None
+        # Evidence is append-only (oldest entries drop once capped), so its length plus the
+        # newest item identifies the slice the context reads from it
+        fingerprint = (
+            "questions",
+            view,
+            entity_fields,
+            tuple(state.information_gaps[:5]),
+            tuple(state.investigation_focus),
+            len(evidence_pool),
+            (last_evidence.content, last_evidence.timestamp) if last_evidence else None
+        )
+        return self._cached_context(fingerprint, lambda: self._render_comprehensive_context(state, view, entity_fields))
+    
+    def _render_comprehensive_context(
+        self, state: InvestigationState, view: _QuestionMetadata, entity_fields: Tuple[tuple, ...]
+    ) -> str:
+        """Render the question formulation context"""
         context_parts = []
         
         # Strategic plan context
-        if state.metadata.get("strategic_plan"):
-            plan = state.metadata["strategic_plan"]
-            current_phase = state.metadata.get("current_phase", "immediate")
-            context_parts.append(f"CURRENT PHASE: {current_phase}")
+        if view.has_plan:
+            context_parts.append(f"CURRENT PHASE: {view.current_phase}")
             
-            if state.metadata.get("current_objectives"):
-                context_parts.append(f"CURRENT OBJECTIVES: {', '.join(state.metadata['current_objectives'])}")
+            if view.current_objectives:
+                context_parts.append(f"CURRENT OBJECTIVES: {', '.join(view.current_objectives)}")
             
             # Interview strategy from plan
-            if plan.get("interview_strategy"):
-                strategy = plan["interview_strategy"]
-                context_parts.append(f"INTERVIEW APPROACH: {strategy.get('questioning_approach', 'adaptive')}")
+            if view.interview_approach is not None:
+                context_parts.append(f"INTERVIEW APPROACH: {view.interview_approach}")
         
         # Target entities with priorities
-        if state.target_entities:
-            entities_info = []
-            for entity in state.target_entities:
-                priority = getattr(entity, 'priority', 'medium')
-                confidence = getattr(entity, 'confidence_score', 0.5)
-                entities_info.append(f"{entity.name} ({entity.entity_type.value}) [Priority: {priority}, Confidence: {confidence:.1f}]")
-            context_parts.append(f"TARGET ENTITIES: {', '.join(entities_info)}")
+        if entity_fields:
+            entities_info = ", ".join(starmap(_entity_fragment, entity_fields))
+            context_parts.append(f"TARGET ENTITIES: {entities_info}")
         
         # Information gaps (prioritized)
         if state.information_gaps:
@@ -225,24 +397,23 @@ class RetrievalAgent(BaseAgent):
         if hasattr(state, 'investigation_focus') and state.investigation_focus:
             context_parts.append(f"CURRENT FOCUS AREAS: {', '.join(state.investigation_focus)}")
         
-        # Recent evidence and patterns
+        # Recent evidence and patterns; scanning from the newest end stops after three
+        # matches instead of filtering the whole pool
         if state.evidence_pool:
-            high_confidence_evidence = [e for e in state.evidence_pool if e.confidence_score > 0.7]
+            high_confidence_evidence = list(islice(
+                (e for e in reversed(state.evidence_pool) if e.confidence_score > 0.7), 3
+            ))
             if high_confidence_evidence:
-                recent_evidence = [e.content[:60] + "..." for e in high_confidence_evidence[-3:]]
+                recent_evidence = [f"{e.content[:60]}..." for e in reversed(high_confidence_evidence)]
                 context_parts.append(f"HIGH-CONFIDENCE EVIDENCE: {'; '.join(recent_evidence)}")
         
         # Previous questioning history
-        question_messages = [msg for msg in state.conversation_history if msg.message_type == "question"]
-        if question_messages:
-            recent_questions = question_messages[-2:]  # Last 2 question sets
-            context_parts.append(f"RECENT QUESTIONS ASKED: {len(recent_questions)} question sets in conversation")
+        if view.recent_question_sets:
+            context_parts.append(f"RECENT QUESTIONS ASKED: {view.recent_question_sets} question sets in conversation")
         
         # Tactical considerations from previous interactions
-        if state.metadata.get("tactical_considerations"):
-            tactical = state.metadata["tactical_considerations"]
-            if tactical.get("sensitivity_factors"):
-                context_parts.append(f"SENSITIVITY FACTORS: {', '.join(tactical['sensitivity_factors'][:3])}")
+        if view.sensitivity_factors:
+            context_parts.append(f"SENSITIVITY FACTORS: {', '.join(view.sensitivity_factors)}")
         
         return "\n".join(context_parts) if context_parts else "Limited context available for questioning."
     
@@ -256,14 +427,16 @@ class RetrievalAgent(BaseAgent):
             context_parts.append(f"RESPONSE CREDIBILITY: {intel_value.get('credibility_score', 0.5)}")
             context_parts.append(f"INFORMATION DENSITY: {intel_value.get('information_density', 'medium')}")
         
+        opportunities = pivot_analysis.get("pivot_opportunities") or _EMPTY
+        
         # New investigation angles
-        if pivot_analysis.get("pivot_opportunities", {}).get("new_investigation_angles"):
-            angles = pivot_analysis["pivot_opportunities"]["new_investigation_angles"]
+        angles = opportunities.get("new_investigation_angles")
+        if angles:
             context_parts.append(f"NEW ANGLES IDENTIFIED: {', '.join(angles[:3])}")
         
         # Information gaps identified
-        if pivot_analysis.get("pivot_opportunities", {}).get("information_gaps_identified"):
-            gaps = pivot_analysis["pivot_opportunities"]["information_gaps_identified"]
+        gaps = opportunities.get("information_gaps_identified")
+        if gaps:
             context_parts.append(f"NEW GAPS IDENTIFIED: {', '.join(gaps[:3])}")
         
         # Strategic recommendations
@@ -276,26 +449,32 @@ class RetrievalAgent(BaseAgent):
     async def _parse_question_response(self, response: str) -> Dict[str, Any]:
         """Parse the JSON response from question formulation"""
         try:
-            json_match = re.search(r'\{.*\}', response, re.DOTALL)
-            if json_match:
-                return json.loads(json_match.group())
+            # A truncated response still yields the sections that closed before the cut
+            data = await extract_json_async(response)
+            if data is None:
+                data = extract_partial_json(response)
+            if data is not None:
+                return data
         except Exception as e:
             self.logger.error(f"Error parsing question response: {e}")
         
-        # Return default structure
+        # Return default structure; sections left out keep their schema defaults and
+        # are not written back to the investigation metadata
         return {
             "question_strategy": {"primary_approach": "adaptive", "information_priority": "medium"},
             "questions": [],
-            "questioning_sequence": {"core_questions": []},
-            "tactical_considerations": {}
+            "questioning_sequence": {"core_questions": []}
         }
     
     async def _parse_adaptation_response(self, response: str) -> Dict[str, Any]:
         """Parse the JSON response from question adaptation"""
         try:
-            json_match = re.search(r'\{.*\}', response, re.DOTALL)
-            if json_match:
-                return json.loads(json_match.group())
+            # A truncated response still yields the sections that closed before the cut
+            data = await extract_json_async(response)
+            if data is None:
+                data = extract_partial_json(response)
+            if data is not None:
+                return data
         except Exception as e:
             self.logger.error(f"Error parsing adaptation response: {e}")
         
@@ -305,76 +484,56 @@ class RetrievalAgent(BaseAgent):
             "follow_up_strategy": {}
         }
     
-    def _prioritize_and_format_questions(self, question_data: Dict[str, Any]) -> List[str]:
+    def _prioritize_and_format_questions(self, question_data: QuestionFormulation) -> List[str]:
         """Prioritize and format questions based on strategic importance"""
-        questions = []
-        
-        # Extract questions from structured data
-        question_items = question_data.get("questions", [])
-        
-        # Sort by priority
-        priority_order = {"critical": 0, "high": 1, "medium": 2, "low": 3}
-        sorted_questions = sorted(
-            question_items, 
-            key=lambda x: priority_order.get(x.get("priority", "medium"), 2)
-        )
-        
-        # Format top priority questions
-        for question_item in sorted_questions[:4]:  # Top 4 questions
-            question_text = question_item.get("question_text", "")
-            if question_text:
-                questions.append(question_text)
+        return list(islice(self._candidate_questions(question_data), QUESTIONS_PER_TURN))
+    
+    def _candidate_questions(self, question_data: QuestionFormulation) -> Iterator[str]:
+        """Lazily yield question texts in ask order, falling back to the questioning sequence"""
+        # Bucket by priority; with four fixed levels this is a single stable pass
+        buckets = [[], [], [], []]
+        for question_item in question_data.questions:
+            buckets[_PRIORITY_ORDER.get(question_item.priority, 2)].append(question_item)
+        
+        # Top priority structured questions
+        found = False
+        for question_item in islice(chain.from_iterable(buckets), QUESTIONS_PER_TURN):
+            if question_item.question_text:
+                found = True
+                yield question_item.question_text
+        if found:
+            return
         
         # If no structured questions, use sequence-based approach
-        if not questions:
-            sequence = question_data.get("questioning_sequence", {})
-            for sequence_type in ["opening_questions", "core_questions", "verification_questions"]:
-                sequence_questions = sequence.get(sequence_type, [])
-                questions.extend(sequence_questions[:2])  # Max 2 from each sequence
-                if len(questions) >= 4:
-                    break
-        
-        return questions[:4]  # Limit to 4 questions maximum
+        sequence = question_data.questioning_sequence
+        for sequence_questions in (sequence.opening_questions, sequence.core_questions, sequence.verification_questions):
+            yield from sequence_questions[:2]  # Max 2 from each sequence
     
-    def _extract_adapted_questions(self, adaptation_data: Dict[str, Any]) -> List[str]:
+    def _extract_adapted_questions(self, adaptation_data: QuestionAdaptation) -> List[str]:
         """Extract adapted questions from adaptation response"""
-        questions = []
-        
-        adapted_questions = adaptation_data.get("adapted_questions", [])
-        for question_item in adapted_questions:
-            question_text = question_item.get("question_text", "")
-            if question_text:
-                questions.append(question_text)
+        questions = [
+            question_item.question_text
+            for question_item in adaptation_data.adapted_questions
+            if question_item.question_text
+        ]
         
         # Add follow-up questions if needed
-        follow_up_strategy = adaptation_data.get("follow_up_strategy", {})
-        immediate_follow_ups = follow_up_strategy.get("immediate_follow_ups", [])
-        questions.extend(immediate_follow_ups[:2])  # Add up to 2 follow-ups
+        questions.extend(adaptation_data.follow_up_strategy.immediate_follow_ups[:2])  # Add up to 2 follow-ups
         
         return questions[:4]  # Limit to 4 questions
     
-    def _format_questions_for_display(self, questions: List[str], question_data: Dict[str, Any]) -> str:
+    def _format_questions_for_display(self, questions: List[str], question_data: QuestionFormulation) -> str:
         """Format questions for display with strategic context"""
         if not questions:
             return "I need to gather more information to continue our investigation effectively."
         
-        # Add strategic context
-        strategy = question_data.get("question_strategy", {})
-        approach = strategy.get("primary_approach", "adaptive")
-        phase = strategy.get("questioning_phase", "development")
-        
         # Format questions with context
         formatted_parts = []
         
         # Add phase context if appropriate
-        if phase == "opening":
-            formatted_parts.append("Let me start by understanding the basics:")
-        elif phase == "development":
-            formatted_parts.append("Now I'd like to explore some key areas in more detail:")
-        elif phase == "probing":
-            formatted_parts.append("I need to probe deeper into some specific aspects:")
-        elif phase == "verification":
-            formatted_parts.append("Let me verify some important details:")
+        phase_prefix = _PHASE_PREFIX.get(question_data.question_strategy.questioning_phase)
+        if phase_prefix:
+            formatted_parts.append(phase_prefix)
         
         # Add questions
         for i, question in enumerate(questions, 1):
@@ -385,18 +544,18 @@ class RetrievalAgent(BaseAgent):
         
         return "\n\n".join(formatted_parts)
     
-    def _create_adaptation_summary(self, adaptation_data: Dict[str, Any]) -> str:
+    def _create_adaptation_summary(self, adaptation_data: QuestionAdaptation) -> str:
         """Create summary of question adaptation"""
         summary_parts = []
         
-        pivot_response = adaptation_data.get("adaptation_strategy", {}).get("pivot_response", "expand")
-        summary_parts.append(f"Strategy: {pivot_response}")
+        adaptation_strategy = adaptation_data.adaptation_strategy
+        summary_parts.append(f"Strategy: {adaptation_strategy.pivot_response}")
         
-        adapted_count = len(adaptation_data.get("adapted_questions", []))
+        adapted_count = len(adaptation_data.adapted_questions)
         if adapted_count > 0:
             summary_parts.append(f"{adapted_count} questions adapted")
         
-        new_priorities = adaptation_data.get("adaptation_strategy", {}).get("new_priorities", [])
+        new_priorities = adaptation_strategy.new_priorities
         if new_priorities:
             summary_parts.append(f"New priorities: {', '.join(new_priorities[:2])}")
         
@@ -410,18 +569,18 @@ class RetrievalAgent(BaseAgent):
         
         # Generate questions based on available context
         if state.target_entities:
-            primary_entity = state.target_entities[0]  # Focus on primary entity
+            name, entity_type = state.target_entities[0].name, state.target_entities[0].entity_type  # Focus on primary entity
             
             # Basic information gathering
-            questions.append(f"Could you tell me more about {primary_entity.name}? What's your relationship or connection to them?")
+            questions.append(f"Could you tell me more about {name}? What's your relationship or connection to them?")
             
             # Context-specific questions
-            if primary_entity.entity_type.value == "person":
-                questions.append(f"What can you tell me about {primary_entity.name}'s current activities or situation?")
-                questions.append(f"Are there other people or organizations that {primary_entity.name} is closely associated with?")
-            elif primary_entity.entity_type.value == "organization":
-                questions.append(f"What do you know about {primary_entity.name}'s operations or business activities?")
-                questions.append(f"Who are the key people involved with {primary_entity.name}?")
+            if entity_type is EntityType.PERSON:
+                questions.append(f"What can you tell me about {name}'s current activities or situation?")
+                questions.append(f"Are there other people or organizations that {name} is closely associated with?")
+            elif entity_type is EntityType.ORGANIZATION:
+                questions.append(f"What do you know about {name}'s operations or business activities?")
+                questions.append(f"Who are the key people involved with {name}?")
             
         # Information gap-based questions
         if state.information_gaps:
@@ -444,6 +603,7 @@ class RetrievalAgent(BaseAgent):
             requires_response=True,
             metadata={"fallback_used": True, "question_count": len(questions[:3])}
         )
-        state.conversation_history.append(message)
+        state.add_message(message)
+        self._count_question_message(state)
         
         return state
\ No newline at end of file
@@ -1,12 +1,112 @@
 import os, sys
 sys.path.append(os.getcwd())
 from agents.base_agent import BaseAgent
-from models.schemas import InvestigationState, IntelligenceReport, Evidence
-from typing import List, Dict, Any
-import json
-import re
+from core.config import get_settings
+from core.json_utils import extract_json_async, json_dumps
+from models.schemas import InvestigationState, IntelligenceReport, EntityType
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, Iterator, Optional
+import hashlib
+import heapq
+from functools import lru_cache
+from collections import OrderedDict, defaultdict
 from datetime import datetime
 
+# Report context budget, using a rough four characters per token
+MAX_CONTEXT_TOKENS = get_settings().MAX_CONTEXT_TOKENS
+CHARS_PER_TOKEN = 4
+REPORT_CONTEXT_CHARS = MAX_CONTEXT_TOKENS * CHARS_PER_TOKEN
+
+# Evidence previews in the report context and fallback findings are cut to this many characters
+PREVIEW_CHARS = 100
+_ELLIPSIS = "..."
+
+# Bound on the number of cached reports
+REPORT_CACHE_SIZE = 128
+
+# Entity profile part of the report schema, dropped when an investigation has no target entities
+_ENTITY_PROFILES_SECTION = """            "entity_profiles": [
+                {
+                    "entity_name": "Name",
+                    "entity_type": "person|organization|location",
+                    "profile_summary": "Comprehensive profile based on collected intelligence",
+                    "key_attributes": {"attribute": "value"},
+                    "relationships": ["relationship1", "relationship2"],
+                    "confidence_score": 0.0-1.0
+                }
+            ],
+"""
+
+# Static instructions and schema lead the report prompt so providers can cache the shared
+# prefix; the investigation context is appended last
+_REPORT_PROMPT_PREFIX = """
+        Generate a comprehensive intelligence report based on all collected data in the investigation context below.
+        
+        Generate a structured report in JSON format:
+        {
+            "executive_summary": "High-level summary of key findings and conclusions",
+            "key_findings": [
+                {
+                    "finding": "Key finding description",
+                    "confidence_score": 0.0-1.0,
+                    "supporting_evidence": ["evidence1", "evidence2"],
+                    "significance": "high|medium|low"
+                }
+            ],
+""" + _ENTITY_PROFILES_SECTION + """            "intelligence_assessment": {
+                "overall_confidence": 0.0-1.0,
+                "information_quality": "excellent|good|fair|poor",
+                "coverage_completeness": 0.0-1.0,
+                "reliability_assessment": "high|medium|low"
+            },
+            "patterns_and_connections": [
+                {
+                    "pattern": "Description of identified pattern",
+                    "entities_involved": ["entity1", "entity2"],
+                    "significance": "high|medium|low",
+                    "confidence": 0.0-1.0
+                }
+            ],
+            "remaining_gaps": [
+                {
+                    "gap_description": "What information is still missing",
+                    "priority": "high|medium|low",
+                    "recommended_approach": "How to fill this gap"
+                }
+            ],
+            "strategic_recommendations": [
+                {
+                    "recommendation": "Actionable recommendation",
+                    "rationale": "Why this recommendation is important",
+                    "priority": "high|medium|low",
+                    "timeline": "immediate|short-term|long-term"
+                }
+            ],
+            "appendices": {
+                "evidence_summary": "Summary of all evidence collected",
+                "methodology_notes": "Notes on investigation methodology",
+                "limitations": "Known limitations of the investigation"
+            }
+        }
+        
+        INVESTIGATION CONTEXT:
+        """
+
+# Placeholder for the entity type choices in the entity profile schema
+_ENTITY_TYPE_CHOICES = '"entity_type": "person|organization|location"'
+
+@lru_cache(maxsize=64)
+def _report_prompt_prefix(entity_types: FrozenSet[EntityType]) -> str:
+    """Report prompt prefix with the entity profile schema narrowed to the investigation's entity types"""
+    # Each distinct combination renders once and stays byte-identical, so provider prefix
+    # caching still applies; investigations without entities get no profile section
+    if not entity_types:
+        return _REPORT_PROMPT_PREFIX.replace(_ENTITY_PROFILES_SECTION, "")
+    choices = "|".join(entity_type.value for entity_type in EntityType if entity_type in entity_types)
+    return _REPORT_PROMPT_PREFIX.replace(_ENTITY_TYPE_CHOICES, f'"entity_type": "{choices}"')
+
+class _ChunkDeliveryError(Exception):
+    """Wraps an on_chunk failure so it bypasses the LLM fallback and reaches the caller"""
+
 class SynthesisReportingAgent(BaseAgent):
     """Agent responsible for synthesizing intelligence and generating comprehensive reports"""
     
@@ -31,6 +131,8 @@ class SynthesisReportingAgent(BaseAgent):
         Think like a senior intelligence analyst preparing a briefing for decision-makers.
         """
         super().__init__("Synthesis & Reporting Agent", llm_provider, system_prompt)
+        # Reports keyed by a digest of everything they were generated from
+        self._report_cache: "OrderedDict[str, IntelligenceReport]" = OrderedDict()
     
     async def process(self, state: InvestigationState) -> InvestigationState:
         """Process the investigation state - this is a required abstract method from BaseAgent"""
@@ -45,106 +147,42 @@ class SynthesisReportingAgent(BaseAgent):
             metadata={
                 "evidence_count": len(state.evidence_pool),
                 "entities_count": len(state.target_entities),
-                "conversation_turns": len([msg for msg in state.conversation_history if msg.agent_name == "User"])
+                "conversation_turns": len(state.messages_of_type("response"))
             }
         )
-        state.conversation_history.append(message)
+        state.add_message(message)
         
         return state
     
-    async def generate_report(self, state: InvestigationState) -> IntelligenceReport:
-        """Generate a comprehensive intelligence report"""
+    async def generate_report(
+        self, state: InvestigationState, on_chunk: Optional[Callable[[str], Awaitable[None]]] = None
+    ) -> IntelligenceReport:
+        """Generate a comprehensive intelligence report, passing raw LLM output to on_chunk as it streams"""
         self.logger.info(f"Generating intelligence report for session {state.session_id}")
         
-        # Build comprehensive context from all collected data
-        context = await self._build_comprehensive_context(state)
-        
-        report_prompt = f"""
-        Generate a comprehensive intelligence report based on all collected data:
-        
-        INVESTIGATION CONTEXT:
-        {context}
-        
-        Generate a structured report in JSON format:
-        {{
-            "executive_summary": "High-level summary of key findings and conclusions",
-            "key_findings": [
-                {{
-                    "finding": "Key finding description",
-                    "confidence_score": 0.0-1.0,
-                    "supporting_evidence": ["evidence1", "evidence2"],
-                    "significance": "high|medium|low"
-                }}
-            ],
-            "entity_profiles": [
-                {{
-                    "entity_name": "Name",
-                    "entity_type": "person|organization|location",
-                    "profile_summary": "Comprehensive profile based on collected intelligence",
-                    "key_attributes": {{"attribute": "value"}},
-                    "relationships": ["relationship1", "relationship2"],
-                    "confidence_score": 0.0-1.0
-                }}
-            ],
-            "intelligence_assessment": {{
-                "overall_confidence": 0.0-1.0,
-                "information_quality": "excellent|good|fair|poor",
-                "coverage_completeness": 0.0-1.0,
-                "reliability_assessment": "high|medium|low"
-            }},
-            "patterns_and_connections": [
-                {{
-                    "pattern": "Description of identified pattern",
-                    "entities_involved": ["entity1", "entity2"],
-                    "significance": "high|medium|low",
-                    "confidence": 0.0-1.0
-                }}
-            ],
-            "remaining_gaps": [
-                {{
-                    "gap_description": "What information is still missing",
-                    "priority": "high|medium|low",
-                    "recommended_approach": "How to fill this gap"
-                }}
-            ],
-            "strategic_recommendations": [
-                {{
-                    "recommendation": "Actionable recommendation",
-                    "rationale": "Why this recommendation is important",
-                    "priority": "high|medium|low",
-                    "timeline": "immediate|short-term|long-term"
-                }}
-            ],
-            "appendices": {{
-                "evidence_summary": "Summary of all evidence collected",
-                "methodology_notes": "Notes on investigation methodology",
-                "limitations": "Known limitations of the investigation"
-            }}
-        }}
-        """
-        
         try:
-            # Disable tools for report generation to get pure text response
-            response = await self.generate_response(report_prompt, use_tools=False)
-            report_data = await self._parse_report_data(response)
-            
-            # Create structured intelligence report
-            report = IntelligenceReport(
-                session_id=state.session_id,
-                executive_summary=report_data.get("executive_summary", "No summary available"),
-                key_findings=report_data.get("key_findings", []),
-                confidence_score=report_data.get("intelligence_assessment", {}).get("overall_confidence", state.confidence_score),
-                evidence_count=len(state.evidence_pool),
-                generated_at=datetime.now(),
-                metadata={
-                    "entity_profiles": report_data.get("entity_profiles", []),
-                    "patterns_and_connections": report_data.get("patterns_and_connections", []),
-                    "remaining_gaps": report_data.get("remaining_gaps", []),
-                    "strategic_recommendations": report_data.get("strategic_recommendations", []),
-                    "intelligence_assessment": report_data.get("intelligence_assessment", {}),
-                    "appendices": report_data.get("appendices", {})
-                }
-            )
+            # Re-runs over an unchanged investigation reuse the previous report without an LLM call
+            cache_key = self._report_cache_key(state)
+            cached = self._report_cache.get(cache_key)
+            if cached is not None:
+                self._report_cache.move_to_end(cache_key)
+                self.logger.info("Reusing cached intelligence report")
+                report = cached.model_copy(
+                    update={
+                        "session_id": state.session_id,
+                        "evidence_count": len(state.evidence_pool),
+                        "generated_at": datetime.now()
+                    },
+                    deep=True
+                )
+            else:
+                context = await self._build_comprehensive_context(state)
+                report = await self._generate_report_from_llm(state, context, on_chunk)
+                # Parse fallbacks carry no findings and are not worth caching
+                if report.key_findings:
+                    self._report_cache[cache_key] = report.model_copy(deep=True)
+                    if len(self._report_cache) > REPORT_CACHE_SIZE:
+                        self._report_cache.popitem(last=False)
             
             # Add report generation message to conversation
             message = self.create_agent_message(
@@ -156,22 +194,98 @@ class SynthesisReportingAgent(BaseAgent):
                     "evidence_analyzed": len(state.evidence_pool)
                 }
             )
-            state.conversation_history.append(message)
+            state.add_message(message)
             
             self.logger.info(f"Report generated successfully with {len(report.key_findings)} findings")
             return report
             
+        except _ChunkDeliveryError as e:
+            # The consumer went away (e.g. a closed WebSocket); that is not a report failure
+            raise e.__cause__ from None
         except Exception as e:
             self.logger.error(f"Error generating report: {e}")
             # Return fallback report
             return await self._generate_fallback_report(state)
     
+    async def _generate_report_from_llm(
+        self,
+        state: InvestigationState,
+        context: str,
+        on_chunk: Optional[Callable[[str], Awaitable[None]]] = None
+    ) -> IntelligenceReport:
+        """Generate and parse a fresh report for the investigation context"""
+        entity_types = frozenset(entity.entity_type for entity in state.target_entities)
+        report_prompt = _report_prompt_prefix(entity_types) + context
+        
+        # Disable tools for report generation to get pure text response
+        if on_chunk is None:
+            response = await self.generate_response(report_prompt, use_tools=False)
+        else:
+            # Forward chunks as they arrive so clients can render the report progressively
+            chunks = []
+            async for chunk in self.generate_response_stream(report_prompt, use_tools=False):
+                chunks.append(chunk)
+                try:
+                    await on_chunk(chunk)
+                except Exception as e:
+                    raise _ChunkDeliveryError() from e
+            response = "".join(chunks)
+        report_data = await self._parse_report_data(response)
+        
+        # Create structured intelligence report
+        return IntelligenceReport(
+            session_id=state.session_id,
+            executive_summary=report_data.get("executive_summary", "No summary available"),
+            key_findings=report_data.get("key_findings", []),
+            confidence_score=report_data.get("intelligence_assessment", {}).get("overall_confidence", state.confidence_score),
+            evidence_count=len(state.evidence_pool),
+            generated_at=datetime.now(),
+            metadata={
+                "entity_profiles": report_data.get("entity_profiles", []),
+                "patterns_and_connections": report_data.get("patterns_and_connections", []),
+                "remaining_gaps": report_data.get("remaining_gaps", []),
+                "strategic_recommendations": report_data.get("strategic_recommendations", []),
+                "intelligence_assessment": report_data.get("intelligence_assessment", {}),
+                "appendices": report_data.get("appendices", {})
+            }
+        )
+    
+    def _report_cache_key(self, state: InvestigationState) -> str:
+        """Digest of everything the report is built from: query, entities, evidence, history, gaps and questions"""
+        digest = hashlib.blake2b(digest_size=16)
+        parts = [state.query, json_dumps(sorted((entity.name, entity.entity_type.value) for entity in state.target_entities))]
+        parts.extend(evidence.content for evidence in state.evidence_pool)
+        # Earlier report messages are outputs rather than inputs, so re-runs still match
+        parts.extend(
+            json_dumps([msg.agent_name, msg.message_type, msg.message])
+            for msg in state.conversation_history if msg.message_type != "report"
+        )
+        parts.append(json_dumps(state.information_gaps))
+        parts.append(json_dumps(state.current_questions))
+        for part in parts:
+            digest.update(part.encode())
+            digest.update(b"\0")
+        return digest.hexdigest()
+    
     async def _build_comprehensive_context(self, state: InvestigationState) -> str:
-        """Build comprehensive context from all investigation data"""
+        """Build comprehensive context from all investigation data, within the context token budget"""
         context_sections = []
+        remaining = REPORT_CONTEXT_CHARS
+        # Sections are rendered lazily in priority order; once the budget is spent the
+        # remaining sections are never built
+        for section in self._iter_context_sections(state):
+            if len(section) > remaining and context_sections:
+                self.logger.warning(f"Report context reached its {MAX_CONTEXT_TOKENS} token budget; later sections omitted")
+                break
+            context_sections.append(section[:remaining])
+            remaining -= len(section) + 2
         
+        return "\n\n".join(context_sections)
+    
+    def _iter_context_sections(self, state: InvestigationState) -> Iterator[str]:
+        """Yield the report context sections in priority order"""
         # Original query and objectives
-        context_sections.append(f"ORIGINAL QUERY: {state.query}")
+        yield f"ORIGINAL QUERY: {state.query}"
         
         # Target entities
         if state.target_entities:
@@ -181,55 +295,50 @@ class SynthesisReportingAgent(BaseAgent):
                 if hasattr(entity, 'priority'):
                     entity_info += f" [Priority: {entity.priority}]"
                 entities_info.append(entity_info)
-            context_sections.append(f"TARGET ENTITIES: {', '.join(entities_info)}")
+            yield f"TARGET ENTITIES: {', '.join(entities_info)}"
         
         # Investigation focus areas
         if hasattr(state, 'investigation_focus') and state.investigation_focus:
-            context_sections.append(f"INVESTIGATION FOCUS: {', '.join(state.investigation_focus)}")
+            yield f"INVESTIGATION FOCUS: {', '.join(state.investigation_focus)}"
         
         # Evidence pool analysis
         if state.evidence_pool:
-            evidence_summary = self._summarize_evidence_pool(state.evidence_pool)
-            context_sections.append(f"EVIDENCE COLLECTED ({len(state.evidence_pool)} items):\n{evidence_summary}")
+            evidence_summary = self._summarize_evidence_pool(state)
+            yield f"EVIDENCE COLLECTED ({len(state.evidence_pool)} items):\n{evidence_summary}"
         
         # Conversation history insights
         if state.conversation_history:
             conversation_summary = self._summarize_conversation_history(state.conversation_history)
-            context_sections.append(f"INVESTIGATION PROCESS:\n{conversation_summary}")
+            yield f"INVESTIGATION PROCESS:\n{conversation_summary}"
         
         # Information gaps
         if state.information_gaps:
-            context_sections.append(f"IDENTIFIED GAPS: {', '.join(state.information_gaps[-10:])}")  # Last 10 gaps
+            yield f"IDENTIFIED GAPS: {', '.join(state.information_gaps[-10:])}"  # Last 10 gaps
         
         # Current questions and focus
         if state.current_questions:
-            context_sections.append(f"RECENT QUESTIONS: {'; '.join(state.current_questions)}")
-        
-        return "\n\n".join(context_sections)
+            yield f"RECENT QUESTIONS: {'; '.join(state.current_questions)}"
     
-    def _summarize_evidence_pool(self, evidence_pool: List[Evidence]) -> str:
+    def _summarize_evidence_pool(self, state: InvestigationState) -> str:
         """Summarize the evidence pool for context"""
-        if not evidence_pool:
+        if not state.evidence_pool:
             return "No evidence collected"
         
-        # Group evidence by type
-        evidence_by_type = {}
-        for evidence in evidence_pool:
-            evidence_type = evidence.evidence_type.value
-            if evidence_type not in evidence_by_type:
-                evidence_by_type[evidence_type] = []
-            evidence_by_type[evidence_type].append(evidence)
+        # Grouping and confidence sums are maintained incrementally as evidence is added
+        evidence_by_type = state.evidence_by_type()
         
         summary_parts = []
-        for evidence_type, items in evidence_by_type.items():
-            avg_confidence = sum(item.confidence_score for item in items) / len(items)
+        for evidence_type, (items, confidence_sum) in evidence_by_type.items():
+            avg_confidence = confidence_sum / len(items)
             summary_parts.append(f"- {evidence_type.title()}: {len(items)} items (avg confidence: {avg_confidence:.2f})")
             
             # Include top evidence items
-            top_items = sorted(items, key=lambda x: x.confidence_score, reverse=True)[:3]
+            top_items = heapq.nlargest(3, items, key=lambda x: x.confidence_score)
             for item in top_items:
-                content_preview = item.content[:100] + "..." if len(item.content) > 100 else item.content
-                summary_parts.append(f"  • {content_preview} (confidence: {item.confidence_score:.2f})")
+                # Truncation is formatted into the line itself, without an intermediate preview string
+                content = item.content
+                ellipsis = _ELLIPSIS if len(content) > PREVIEW_CHARS else ""
+                summary_parts.append(f"  • {content[:PREVIEW_CHARS]}{ellipsis} (confidence: {item.confidence_score:.2f})")
         
         return "\n".join(summary_parts)
     
@@ -239,12 +348,9 @@ class SynthesisReportingAgent(BaseAgent):
             return "No conversation history"
         
         # Group messages by agent
-        agent_messages = {}
+        agent_messages = defaultdict(list)
         for message in conversation_history:
-            agent_name = message.agent_name
-            if agent_name not in agent_messages:
-                agent_messages[agent_name] = []
-            agent_messages[agent_name].append(message)
+            agent_messages[message.agent_name].append(message)
         
         summary_parts = []
         for agent_name, messages in agent_messages.items():
@@ -265,19 +371,15 @@ class SynthesisReportingAgent(BaseAgent):
         self.logger.debug(f"Attempting to parse response of length {len(response)}: {response[:200]}...")
         
         try:
-            # First try to find JSON in the response
-            json_match = re.search(r'\{.*\}', response, re.DOTALL)
-            if json_match:
-                json_str = json_match.group()
-                self.logger.debug(f"Found JSON match of length {len(json_str)}")
-                parsed_data = json.loads(json_str)
+            # Single brace-depth scan for the first balanced object; trailing prose is ignored
+            parsed_data = await extract_json_async(response)
+            if parsed_data is not None:
                 self.logger.info("Successfully parsed report data from JSON response")
                 return parsed_data
             else:
                 self.logger.warning("No JSON structure found in response")
-        except json.JSONDecodeError as e:
+        except ValueError as e:
             self.logger.error(f"JSON decode error: {e}")
-            self.logger.debug(f"Failed JSON content: {json_match.group() if json_match else 'No JSON match'}")
         except Exception as e:
             self.logger.error(f"Unexpected error parsing report data: {e}")
         
@@ -312,7 +414,7 @@ class SynthesisReportingAgent(BaseAgent):
             high_confidence_evidence = [e for e in state.evidence_pool if e.confidence_score > 0.7]
             for evidence in high_confidence_evidence[:5]:  # Top 5 high-confidence items
                 basic_findings.append({
-                    "finding": evidence.content[:100] + "..." if len(evidence.content) > 100 else evidence.content,
+                    "finding": evidence.content[:PREVIEW_CHARS] + _ELLIPSIS if len(evidence.content) > PREVIEW_CHARS else evidence.content,
                     "confidence_score": evidence.confidence_score,
                     "supporting_evidence": [evidence.source],
                     "significance": "medium"
@@ -124,9 +124,7 @@ async def close_investigation(
     try:
         intelligence_service = app_request.app.state.intelligence_service
         
-        state = intelligence_service.get_investigation_state(session_id)
-        if state:
-            del intelligence_service.active_investigations[session_id]
+        if intelligence_service.close_investigation(session_id):
             logger.info(f"Investigation {session_id} closed")
             return {"message": "Investigation closed successfully"}
         else:
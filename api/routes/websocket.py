@@ -1,58 +1,85 @@
 # api/routes/websocket.py
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Request
 import logging
-import json
 from datetime import datetime
 from typing import Dict, Any
 
-from models.schemas import WebSocketMessage
+from core.json_utils import json_dumps, json_loads
+from services.websocket_manager import encode_message
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+# Invalid-JSON error frames differ only in their timestamp, so the frame text is a fixed template
+_INVALID_JSON_FRAME = '{"type":"error","data":{"message":"Invalid JSON format"},"timestamp":"%s"}'
+
 @router.websocket("/ws/{session_id}")
 async def websocket_endpoint(websocket: WebSocket, session_id: str):
     """WebSocket endpoint for real-time investigation updates"""
     await websocket.accept()
     
     # Get websocket manager from app state
-    websocket_manager = websocket.application.state.websocket_manager
+    websocket_manager = websocket.app.state.websocket_manager
     
     try:
         # Register connection
         await websocket_manager.connect(session_id, websocket)
         
         # Send welcome message
-        welcome_msg = WebSocketMessage(
-            type="connection",
-            data={"message": f"Connected to investigation {session_id}"}
-        )
-        await websocket.send_text(welcome_msg.model_dump_json())
+        await websocket.send_text(encode_message(
+            "connection", {"message": f"Connected to investigation {session_id}"}
+        ))
+        
+        # Response frames are reused for every inbound message on this connection
+        echo_data = {"echo": None, "received_at": None}
+        response_frame = {"type": "response", "data": echo_data, "timestamp": None}
         
         # Listen for messages
         while True:
             data = await websocket.receive_text()
             
             try:
-                message_data = json.loads(data)
-                
-                # Echo back for demo (in real implementation, process the message)
-                response_msg = WebSocketMessage(
-                    type="response",
-                    data={"echo": message_data, "received_at": datetime.now().isoformat()}
-                )
-                await websocket.send_text(response_msg.model_dump_json())
-                
-            except json.JSONDecodeError:
-                error_msg = WebSocketMessage(
-                    type="error",
-                    data={"message": "Invalid JSON format"}
-                )
-                await websocket.send_text(error_msg.model_dump_json())
-                
+                message_data = json_loads(data)
+            except ValueError:
+                # orjson and stdlib decode errors both subclass ValueError
+                await websocket.send_text(_INVALID_JSON_FRAME % datetime.now().isoformat())
+                continue
+            
+            if isinstance(message_data, dict) and message_data.get("cmd") == "report":
+                await _stream_report(websocket, session_id)
+                continue
+            
+            # Echo back for demo (in real implementation, process the message)
+            now = datetime.now().isoformat()
+            echo_data["echo"] = message_data
+            echo_data["received_at"] = now
+            response_frame["timestamp"] = now
+            await websocket.send_text(json_dumps(response_frame))
+            
     except WebSocketDisconnect:
         logger.info(f"WebSocket disconnected for session {session_id}")
         await websocket_manager.disconnect(session_id)
     except Exception as e:
         logger.error(f"WebSocket error for session {session_id}: {e}")
-        await websocket_manager.disconnect(session_id)
\ No newline at end of file
+        await websocket_manager.disconnect(session_id)
+
+async def _stream_report(websocket: WebSocket, session_id: str) -> None:
+    """Generate the session's report, forwarding LLM output as report_chunk frames before the final report frame"""
+    intelligence_service = websocket.app.state.intelligence_service
+    
+    async def send_chunk(chunk: str) -> None:
+        await websocket.send_text(encode_message("report_chunk", {"chunk": chunk}))
+    
+    try:
+        report = await intelligence_service.generate_report(session_id, on_chunk=send_chunk)
+    except ValueError as e:
+        await websocket.send_text(encode_message("error", {"message": str(e)}))
+        return
+    except WebSocketDisconnect:
+        raise
+    except Exception as e:
+        logger.error(f"Error streaming report for session {session_id}: {e}")
+        await websocket.send_text(encode_message("error", {"message": "Error generating report"}))
+        return
+    
+    await websocket.send_text(encode_message("report", report.model_dump(mode="json")))
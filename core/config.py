@@ -32,6 +32,11 @@ class Settings(BaseSettings):
     # Memory Configuration
     MAX_CONTEXT_TOKENS: int = 100000
     MAX_EVIDENCE_ITEMS: int = 1000
+    MAX_INFORMATION_GAPS: int = 32
+    MAX_CONVERSATION_HISTORY: int = 500
+    
+    # Load the embedding model at startup; disable for short-lived processes that may never embed
+    PREWARM_EMBEDDINGS: bool = True
     
     # Database Configuration (if needed)
     DATABASE_URL: Optional[str] = None
@@ -0,0 +1,168 @@
+import asyncio
+import json
+import re
+from typing import Any, List, Optional, Tuple
+
+try:
+    import orjson
+    # orjson accepts str or bytes and is several times faster than the stdlib decoder
+    json_loads = orjson.loads
+
+    def json_dumps(obj: Any) -> str:
+        """Serialize obj to compact JSON text"""
+        # Non-string keys are stringified like the stdlib encoder instead of raising
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+except ImportError:
+    json_loads = json.loads
+
+    def json_dumps(obj: Any) -> str:
+        """Serialize obj to compact JSON text"""
+        # Match orjson's output: no whitespace and non-ASCII text left unescaped
+        return json.dumps(obj, separators=(",", ":"), ensure_ascii=False)
+
+# Characters that can change brace depth or string state while scanning for JSON
+_STRUCTURAL_RE = re.compile(r'[{}"\\]')
+
+# Streaming also needs array brackets and commas to find top-level member boundaries
+_STREAM_TOKEN_RE = re.compile(r'[{}\[\],"\\]')
+
+def find_json_object(text: str) -> Optional[str]:
+    """Return the first balanced {...} object embedded in text, or None"""
+    # Single linear pass tracking brace depth; braces inside string literals are
+    # ignored, so trailing prose after the JSON body is never swallowed
+    start = text.find("{")
+    if start == -1:
+        return None
+
+    depth = 0
+    in_string = False
+    escaped = -1
+    for match in _STRUCTURAL_RE.finditer(text, start):
+        i = match.start()
+        if i == escaped:
+            continue
+        char = match.group()
+        if char == "\\":
+            if in_string:
+                escaped = i + 1
+        elif char == '"':
+            in_string = not in_string
+        elif in_string:
+            continue
+        elif char == "{":
+            depth += 1
+        else:
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+
+    return None
+
+
+# Responses longer than this are parsed off the event loop
+OFFLOAD_PARSE_CHARS = 64 * 1024
+
+# Shared stdlib decoder for raw_decode, which decodes an object embedded in surrounding text
+_DECODER = json.JSONDecoder()
+
+def extract_json(text: str) -> Optional[Any]:
+    """Locate and decode the first JSON object embedded in text, or None if there is none"""
+    start = text.find("{")
+    if start == -1:
+        return None
+    if start == 0:
+        # JSON-mode responses are usually the bare object; decode it directly and only
+        # fall back to the brace scan when there is surrounding prose
+        try:
+            return json_loads(text)
+        except ValueError:
+            pass
+    try:
+        # raw_decode locates the end of the object and decodes it in one C-level pass,
+        # ignoring whatever prose or code fence follows
+        return _DECODER.raw_decode(text, start)[0]
+    except ValueError:
+        pass
+    # The first brace did not open valid JSON; fall back to the string-aware brace scan
+    payload = find_json_object(text)
+    return json_loads(payload) if payload is not None else None
+
+async def extract_json_async(text: str) -> Optional[Any]:
+    """extract_json that moves large payloads to a worker thread"""
+    if len(text) > OFFLOAD_PARSE_CHARS:
+        return await asyncio.to_thread(extract_json, text)
+    return extract_json(text)
+
+
+class JSONObjectStream:
+    """Incrementally scan streamed text and surface top-level members of its first JSON object"""
+    
+    def __init__(self):
+        self.text = ""
+        self.complete = False
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = -1
+        self._member_start = -1
+    
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """Consume a chunk and return the (key, value) members that closed within it"""
+        members: List[Tuple[str, Any]] = []
+        self.text += chunk
+        if self.complete:
+            return members
+        
+        if self._member_start == -1:
+            # Skip any preamble before the root object opens
+            start = self.text.find("{", self._pos)
+            if start == -1:
+                self._pos = len(self.text)
+                return members
+            self._depth = 1
+            self._member_start = self._pos = start + 1
+        
+        text = self.text
+        for match in _STREAM_TOKEN_RE.finditer(text, self._pos):
+            i = match.start()
+            if i == self._escaped:
+                continue
+            char = match.group()
+            if char == "\\":
+                if self._in_string:
+                    self._escaped = i + 1
+            elif char == '"':
+                self._in_string = not self._in_string
+            elif self._in_string:
+                continue
+            elif char == "{" or char == "[":
+                self._depth += 1
+            elif char == ",":
+                if self._depth == 1:
+                    self._emit(text[self._member_start:i], members)
+                    self._member_start = i + 1
+            else:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._emit(text[self._member_start:i], members)
+                    self.complete = True
+                    break
+        
+        self._pos = len(text)
+        return members
+    
+    def _emit(self, member: str, members: List[Tuple[str, Any]]) -> None:
+        """Decode one `"key": value` member; malformed members are left to the final full parse"""
+        member = member.strip()
+        if not member:
+            return
+        try:
+            members.extend(json_loads("{" + member + "}").items())
+        except ValueError:
+            pass
+
+
+def extract_partial_json(text: str) -> Optional[dict]:
+    """Decode the top-level members that closed before a truncated JSON object was cut off"""
+    members = JSONObjectStream().feed(text)
+    return dict(members) if members else None
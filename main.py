@@ -2,6 +2,7 @@ from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 import uvicorn
+import asyncio
 import logging
 from typing import Dict, List
 import json
@@ -12,6 +13,7 @@ from core.config import get_settings
 from core.logging_config import setup_logging
 from services.intelligence_service import IntelligenceService
 from services.websocket_manager import WebSocketManager
+from services.embeddings import prewarm as prewarm_embeddings
 
 # Initialize settings and logging
 settings = get_settings()
@@ -32,6 +34,10 @@ async def lifespan(app: FastAPI):
     intelligence_service = IntelligenceService()
     websocket_manager = WebSocketManager()
     
+    # Load the shared embedding model in the background so the first request doesn't pay for it;
+    # the task is kept on app.state so it isn't garbage-collected and is awaited on shutdown
+    app.state.prewarm_task = asyncio.create_task(prewarm_embeddings()) if settings.PREWARM_EMBEDDINGS else None
+    
     # Make services available to routes
     app.state.intelligence_service = intelligence_service
     app.state.websocket_manager = websocket_manager
@@ -40,6 +46,15 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     logger.info("Shutting down Intelligence Gathering Service...")
+    prewarm_task = app.state.prewarm_task
+    if prewarm_task is not None:
+        prewarm_task.cancel()
+        try:
+            await prewarm_task
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.warning(f"Embedding prewarm failed: {e}")
     if websocket_manager:
         await websocket_manager.disconnect_all()
 
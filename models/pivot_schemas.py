@@ -0,0 +1,31 @@
+from pydantic import BaseModel
+from typing import List
+
+class IntelligenceValue(BaseModel):
+    credibility_score: float = 0.5
+    information_density: str = "medium"
+    new_entities_mentioned: List[str] = []
+    key_revelations: List[str] = []
+
+class PivotOpportunities(BaseModel):
+    new_investigation_angles: List[str] = []
+    follow_up_priorities: List[str] = []
+    information_gaps_identified: List[str] = []
+    potential_connections: List[str] = []
+
+class StrategicRecommendations(BaseModel):
+    next_focus_areas: List[str] = []
+    questioning_strategy: str = "probing"
+    investigation_expansion: List[str] = []
+
+class EvidenceAssessment(BaseModel):
+    actionable_intelligence: List[str] = []
+    requires_verification: List[str] = []
+    contradictions_noted: List[str] = []
+
+class PivotAnalysis(BaseModel):
+    """Structured-output schema mirroring the pivot analysis JSON prompt"""
+    intelligence_value: IntelligenceValue = IntelligenceValue()
+    pivot_opportunities: PivotOpportunities = PivotOpportunities()
+    strategic_recommendations: StrategicRecommendations = StrategicRecommendations()
+    evidence_assessment: EvidenceAssessment = EvidenceAssessment()
@@ -0,0 +1,99 @@
+from pydantic import BaseModel, field_validator
+from typing import Any, Dict, List, Literal
+
+QUESTIONING_APPROACHES = ("direct", "indirect", "layered", "adaptive")
+
+class MissionAnalysis(BaseModel):
+    primary_objectives: List[str] = []
+    success_criteria: List[str] = []
+    critical_information_requirements: List[str] = []
+    priority_intelligence_targets: List[str] = []
+
+class Phase1Immediate(BaseModel):
+    objectives: List[str] = []
+    collection_methods: List[str] = []
+    expected_outcomes: List[str] = []
+    success_indicators: List[str] = []
+
+class Phase2Development(BaseModel):
+    objectives: List[str] = []
+    collection_methods: List[str] = []
+    pivot_opportunities: List[str] = []
+    expansion_targets: List[str] = []
+
+class Phase3Exploitation(BaseModel):
+    objectives: List[str] = []
+    synthesis_requirements: List[str] = []
+    verification_needs: List[str] = []
+
+class CollectionStrategy(BaseModel):
+    phase_1_immediate: Phase1Immediate = Phase1Immediate()
+    phase_2_development: Phase2Development = Phase2Development()
+    phase_3_exploitation: Phase3Exploitation = Phase3Exploitation()
+
+class InterviewStrategy(BaseModel):
+    questioning_approach: Literal["direct", "indirect", "layered", "adaptive"] = "adaptive"
+    rapport_building: List[str] = []
+    information_elicitation: List[str] = []
+    verification_methods: List[str] = []
+    pivot_triggers: List[str] = []
+
+    @field_validator("questioning_approach", mode="before")
+    @classmethod
+    def _known_approach(cls, value):
+        """Map unrecognised approaches to adaptive rather than rejecting the whole plan"""
+        return value if value in QUESTIONING_APPROACHES else "adaptive"
+
+class CoordinationPlan(BaseModel):
+    retrieval_agent_tasks: List[str] = []
+    pivot_agent_triggers: List[str] = []
+    synthesis_checkpoints: List[str] = []
+    quality_control_measures: List[str] = []
+
+class RiskManagement(BaseModel):
+    operational_risks: List[str] = []
+    information_security: List[str] = []
+    source_protection: List[str] = []
+    contingency_plans: List[str] = []
+
+class ResourceAllocation(BaseModel):
+    time_estimates: Dict[str, Any] = {}
+    priority_distribution: Dict[str, Any] = {}
+    collection_focus: List[str] = []
+
+class StrategicPlan(BaseModel):
+    """Structured-output schema mirroring the strategic plan JSON prompt"""
+    mission_analysis: MissionAnalysis = MissionAnalysis()
+    collection_strategy: CollectionStrategy = CollectionStrategy()
+    interview_strategy: InterviewStrategy = InterviewStrategy()
+    coordination_plan: CoordinationPlan = CoordinationPlan()
+    risk_management: RiskManagement = RiskManagement()
+    resource_allocation: ResourceAllocation = ResourceAllocation()
+
+class ObjectiveCompletion(BaseModel):
+    completed: List[str] = []
+    in_progress: List[str] = []
+    blocked: List[str] = []
+
+class StrategyAssessment(BaseModel):
+    current_phase_status: str = "on_track"
+    objective_completion: ObjectiveCompletion = ObjectiveCompletion()
+    new_opportunities: List[str] = []
+    emerging_priorities: List[str] = []
+
+class TacticalAdjustments(BaseModel):
+    questioning_modifications: List[str] = []
+    focus_shifts: List[str] = []
+    new_collection_targets: List[str] = []
+    pivot_recommendations: List[str] = []
+
+class NextPhasePreparation(BaseModel):
+    readiness_assessment: str = "needs_more_intel"
+    transition_triggers: List[str] = []
+    preparation_tasks: List[str] = []
+
+class StrategyUpdate(BaseModel):
+    """Structured-output schema mirroring the strategy update JSON prompt"""
+    strategy_assessment: StrategyAssessment = StrategyAssessment()
+    tactical_adjustments: TacticalAdjustments = TacticalAdjustments()
+    next_phase_preparation: NextPhasePreparation = NextPhasePreparation()
@@ -0,0 +1,82 @@
+from pydantic import BaseModel, ValidationInfo, field_validator
+from typing import Any, List, get_args, get_origin
+
+class _LenientModel(BaseModel):
+    """Base for LLM-facing schemas where one malformed value must not reject the whole response"""
+
+    @field_validator("*", mode="before")
+    @classmethod
+    def _coerce_llm_value(cls, value: Any, info: ValidationInfo) -> Any:
+        """Replace nulls and mistyped values with the field default, stringify scalars and drop bad list items"""
+        field = cls.model_fields[info.field_name]
+        default = field.get_default(call_default_factory=True)
+        annotation = field.annotation
+        if annotation is str:
+            if isinstance(value, str):
+                return value
+            return str(value) if isinstance(value, (int, float)) else default
+        if get_origin(annotation) is list:
+            if isinstance(value, str) and get_args(annotation)[0] is str:
+                return [value]
+            if not isinstance(value, list):
+                return default
+            if get_args(annotation)[0] is str:
+                return [str(item) for item in value if isinstance(item, (str, int, float))]
+            return [item for item in value if isinstance(item, (dict, BaseModel))]
+        return value if isinstance(value, (dict, BaseModel)) else default
+
+class QuestionStrategy(_LenientModel):
+    primary_approach: str = "adaptive"
+    questioning_phase: str = "development"
+    rapport_level: str = "building"
+    information_priority: str = "medium"
+
+class QuestionItem(_LenientModel):
+    question_text: str = ""
+    question_type: str = "open_ended"
+    strategic_purpose: str = ""
+    expected_information: str = ""
+    priority: str = "medium"
+    follow_up_potential: str = "medium"
+
+class QuestioningSequence(_LenientModel):
+    opening_questions: List[str] = []
+    core_questions: List[str] = []
+    verification_questions: List[str] = []
+    expansion_questions: List[str] = []
+
+class TacticalConsiderations(_LenientModel):
+    sensitivity_factors: List[str] = []
+    potential_resistance_points: List[str] = []
+    rapport_maintenance: List[str] = []
+    pivot_opportunities: List[str] = []
+
+class QuestionFormulation(_LenientModel):
+    """Structured-output schema mirroring the question formulation JSON prompt"""
+    question_strategy: QuestionStrategy = QuestionStrategy()
+    questions: List[QuestionItem] = []
+    questioning_sequence: QuestioningSequence = QuestioningSequence()
+    tactical_considerations: TacticalConsiderations = TacticalConsiderations()
+
+class AdaptationStrategy(_LenientModel):
+    pivot_response: str = "expand"
+    new_priorities: List[str] = []
+    questioning_adjustments: List[str] = []
+    tactical_shifts: List[str] = []
+
+class AdaptedQuestion(_LenientModel):
+    question_text: str = ""
+    adaptation_reason: str = ""
+    expected_intelligence: str = ""
+    priority: str = "medium"
+
+class FollowUpStrategy(_LenientModel):
+    immediate_follow_ups: List[str] = []
+    contingent_questions: List[str] = []
+    verification_needs: List[str] = []
+
+class QuestionAdaptation(_LenientModel):
+    """Structured-output schema mirroring the question adaptation JSON prompt"""
+    adaptation_strategy: AdaptationStrategy = AdaptationStrategy()
+    adapted_questions: List[AdaptedQuestion] = []
+    follow_up_strategy: FollowUpStrategy = FollowUpStrategy()
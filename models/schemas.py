@@ -1,7 +1,15 @@
-from pydantic import BaseModel, Field
-from typing import Dict, List, Any, Optional, Union
+from pydantic import BaseModel, Field, PrivateAttr
+from typing import Dict, Iterable, List, Any, Optional, Sequence, Set, Tuple, Union
 from datetime import datetime
 from enum import Enum
+import operator
+from core.config import get_settings
+
+# Per-session caps; the oldest entries are dropped once a collection is full
+_settings = get_settings()
+MAX_EVIDENCE_ITEMS = _settings.MAX_EVIDENCE_ITEMS
+MAX_INFORMATION_GAPS = _settings.MAX_INFORMATION_GAPS
+MAX_CONVERSATION_HISTORY = _settings.MAX_CONVERSATION_HISTORY
 
 class EntityType(str, Enum):
     PERSON = "person"
@@ -76,6 +84,119 @@ class InvestigationState(BaseModel):
     created_at: datetime
     updated_at: datetime
     metadata: Dict[str, Any] = Field(default_factory=dict)  # For storing strategic plans, phase info, etc.
+    # conversation_history grouped by message type, maintained by add_message, and the
+    # history snapshot the index was built from
+    _history_by_type: Dict[str, List[AgentMessage]] = PrivateAttr(default_factory=dict)
+    _indexed_history: List[AgentMessage] = PrivateAttr(default_factory=list)
+    # evidence_pool grouped by evidence type with running confidence sums, maintained by add_evidence
+    _evidence_by_type: Dict[str, List[Evidence]] = PrivateAttr(default_factory=dict)
+    _confidence_by_type: Dict[str, float] = PrivateAttr(default_factory=dict)
+    
+    def add_evidence(self, items: List[Evidence]) -> None:
+        """Append evidence, keeping only the most recent MAX_EVIDENCE_ITEMS"""
+        pool = self.evidence_pool
+        self._sync_evidence_index()
+        for evidence in items:
+            self._index_evidence(evidence)
+        pool.extend(items)
+        if len(pool) > MAX_EVIDENCE_ITEMS:
+            dropped = pool[:-MAX_EVIDENCE_ITEMS]
+            del pool[:-MAX_EVIDENCE_ITEMS]
+            # Dropped evidence is the oldest of its type, so each sits at the front of its list
+            for old_evidence in dropped:
+                evidence_type = old_evidence.evidence_type.value
+                del self._evidence_by_type[evidence_type][0]
+                self._confidence_by_type[evidence_type] -= old_evidence.confidence_score
+    
+    def evidence_by_type(self) -> Dict[str, Tuple[Sequence[Evidence], float]]:
+        """Evidence grouped by type as (items in pool order, confidence sum); the lists must not be mutated"""
+        self._sync_evidence_index()
+        confidence = self._confidence_by_type
+        return {
+            evidence_type: (items, confidence[evidence_type])
+            for evidence_type, items in self._evidence_by_type.items()
+            if items
+        }
+    
+    def _index_evidence(self, evidence: Evidence) -> None:
+        """Add one evidence item to the per-type index"""
+        evidence_type = evidence.evidence_type.value
+        self._evidence_by_type.setdefault(evidence_type, []).append(evidence)
+        self._confidence_by_type[evidence_type] = self._confidence_by_type.get(evidence_type, 0.0) + evidence.confidence_score
+    
+    def _sync_evidence_index(self) -> None:
+        """Rebuild the per-type evidence index if the pool changed without add_evidence"""
+        if sum(map(len, self._evidence_by_type.values())) != len(self.evidence_pool):
+            self._evidence_by_type.clear()
+            self._confidence_by_type.clear()
+            for evidence in self.evidence_pool:
+                self._index_evidence(evidence)
+    
+    def add_information_gaps(self, gaps: Iterable[Any]) -> None:
+        """Append new information gaps, skipping duplicates and keeping only the most recent MAX_INFORMATION_GAPS"""
+        seen = {_normalize_gap(gap) for gap in self.information_gaps}
+        _extend_bounded(self.information_gaps, _unique_gaps(gaps, seen), MAX_INFORMATION_GAPS)
+    
+    def set_information_gaps(self, gaps: Iterable[Any]) -> None:
+        """Replace the information gaps, deduplicated and bounded like add_information_gaps"""
+        self.information_gaps = _unique_gaps(gaps, set())[-MAX_INFORMATION_GAPS:]
+    
+    def add_message(self, message: AgentMessage) -> None:
+        """Append a message, keeping only the most recent MAX_CONVERSATION_HISTORY"""
+        self._sync_history_index()
+        history = self.conversation_history
+        index = self._history_by_type
+        index.setdefault(message.message_type, []).append(message)
+        history.append(message)
+        self._indexed_history.append(message)
+        if len(history) > MAX_CONVERSATION_HISTORY:
+            dropped = history[:-MAX_CONVERSATION_HISTORY]
+            del history[:-MAX_CONVERSATION_HISTORY]
+            del self._indexed_history[:-MAX_CONVERSATION_HISTORY]
+            # Dropped messages are the oldest of their type, so each sits at the front of its list
+            for old_message in dropped:
+                messages = index.get(old_message.message_type)
+                if messages:
+                    del messages[0]
+    
+    def messages_of_type(self, message_type: str) -> Sequence[AgentMessage]:
+        """Messages of one type in conversation order; the returned list must not be mutated"""
+        self._sync_history_index()
+        return self._history_by_type.get(message_type, ())
+    
+    def _sync_history_index(self) -> None:
+        """Rebuild the per-type message index if the history changed without add_message"""
+        history = self.conversation_history
+        indexed = self._indexed_history
+        # Compared by identity, so in-place edits that keep the length are caught as well
+        if len(history) != len(indexed) or not all(map(operator.is_, history, indexed)):
+            index = self._history_by_type
+            index.clear()
+            for message in history:
+                index.setdefault(message.message_type, []).append(message)
+            self._indexed_history = list(history)
+
+def _normalize_gap(gap: Any) -> str:
+    """Dedup key for an information gap; numbers from LLM JSON count as text, other values as empty"""
+    if isinstance(gap, (int, float)):
+        gap = str(gap)
+    return gap.strip().lower() if isinstance(gap, str) else ""
+
+def _unique_gaps(gaps: Iterable[Any], seen: Set[str]) -> List[str]:
+    """Gaps as text whose normalized form is non-empty and not yet in seen, which is updated"""
+    unique = []
+    for gap in gaps:
+        normalized = _normalize_gap(gap)
+        if normalized and normalized not in seen:
+            seen.add(normalized)
+            unique.append(gap if isinstance(gap, str) else str(gap))
+    return unique
+
+def _extend_bounded(items: list, new_items, limit: int) -> None:
+    """Extend a list in place and drop its oldest entries beyond limit"""
+    items.extend(new_items)
+    if len(items) > limit:
+        del items[:-limit]
 
 class IntelligenceReport(BaseModel):
     session_id: str
@@ -0,0 +1,104 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Sequence, Tuple
+import asyncio
+import logging
+import math
+import os
+import re
+import threading
+import zlib
+
+logger = logging.getLogger(__name__)
+
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:
+    SentenceTransformer = None
+
+EMBEDDING_MODEL = "BAAI/bge-small-en-v1.5"
+EMBEDDING_BATCH_SIZE = 64
+
+# Dimensionality of the hashed bag-of-words fallback
+HASHED_DIMENSIONS = 256
+
+# Texts whose embeddings are memoized; comfortably above the evidence pool bound
+EMBEDDING_CACHE_SIZE = 4096
+
+_TOKEN_RE = re.compile(r"\w+")
+
+# One model per process, loaded once and shared by every agent
+_model = None
+_model_lock = threading.Lock()
+
+# Per-text embeddings for texts embedded repeatedly, such as evidence and cache keys
+_embedding_cache: "OrderedDict[str, Tuple[float, ...]]" = OrderedDict()
+_embedding_cache_lock = threading.Lock()
+
+# Bounded pool for embedding work so concurrent investigations don't block the event loop
+_executor = ThreadPoolExecutor(max_workers=os.cpu_count() or 4, thread_name_prefix="embedding")
+
+def _get_model():
+    """Load the sentence-transformers model on first use, if the package is installed"""
+    global _model
+    if _model is None and SentenceTransformer is not None:
+        with _model_lock:
+            if _model is None:
+                logger.info(f"Loading embedding model {EMBEDDING_MODEL}")
+                _model = SentenceTransformer(EMBEDDING_MODEL)
+    return _model
+
+def _hashed_embedding(text: str) -> List[float]:
+    """Deterministic L2-normalized bag-of-words vector used when no model is available"""
+    vector = [0.0] * HASHED_DIMENSIONS
+    for token in _TOKEN_RE.findall(text.lower()):
+        vector[zlib.crc32(token.encode()) % HASHED_DIMENSIONS] += 1.0
+    norm = math.sqrt(sum(v * v for v in vector))
+    return [v / norm for v in vector] if norm else vector
+
+def embed_text(text: str) -> List[float]:
+    """Return an L2-normalized embedding for text"""
+    return embed_texts([text])[0]
+
+def embed_texts(texts: List[str]) -> List[List[float]]:
+    """Return L2-normalized embeddings for a batch of texts"""
+    model = _get_model()
+    if model is None:
+        return [_hashed_embedding(text) for text in texts]
+    return model.encode(texts, batch_size=EMBEDDING_BATCH_SIZE, normalize_embeddings=True).tolist()
+
+def embed_text_cached(text: str) -> Tuple[float, ...]:
+    """embed_text memoized for texts that are embedded repeatedly"""
+    return embed_texts_cached([text])[0]
+
+def embed_texts_cached(texts: Sequence[str]) -> List[Tuple[float, ...]]:
+    """embed_texts that only embeds texts not seen before, in a single batch"""
+    with _embedding_cache_lock:
+        embeddings = [_embedding_cache.get(text) for text in texts]
+        for text, embedding in zip(texts, embeddings):
+            if embedding is not None:
+                _embedding_cache.move_to_end(text)
+    
+    missing = list(dict.fromkeys(text for text, embedding in zip(texts, embeddings) if embedding is None))
+    if not missing:
+        return embeddings
+    
+    # The model runs outside the lock so other threads can keep reading the cache
+    fresh = dict(zip(missing, map(tuple, embed_texts(missing))))
+    with _embedding_cache_lock:
+        _embedding_cache.update(fresh)
+        while len(_embedding_cache) > EMBEDDING_CACHE_SIZE:
+            _embedding_cache.popitem(last=False)
+    return [fresh[text] if embedding is None else embedding for text, embedding in zip(texts, embeddings)]
+
+async def run_in_embedding_pool(func: Callable[..., Any], *args: Any) -> Any:
+    """Run embedding-bound work on the shared pool instead of the event loop"""
+    return await asyncio.get_running_loop().run_in_executor(_executor, func, *args)
+
+async def prewarm() -> None:
+    """Load the embedding model ahead of the first request"""
+    await run_in_embedding_pool(_get_model)
+
+def cosine_similarity(a: Sequence[float], b: Sequence[float]) -> float:
+    """Cosine similarity of two L2-normalized vectors"""
+    return sum(x * y for x, y in zip(a, b))
@@ -1,4 +1,4 @@
-from typing import Dict, Any, Optional
+from typing import Any, Awaitable, Callable, Dict, Optional
 import uuid
 from datetime import datetime
 import logging
@@ -78,7 +78,7 @@ class IntelligenceService:
             
             # Add pipeline initialization message
             pipeline_message = self._create_pipeline_message(state)
-            state.conversation_history.append(pipeline_message)
+            state.add_message(pipeline_message)
             
             logger.info(f"Investigation {session_id} pipeline initialized successfully")
             return state
@@ -105,7 +105,7 @@ class IntelligenceService:
                 timestamp=datetime.now(),
                 message_type="response"
             )
-            state.conversation_history.append(user_message)
+            state.add_message(user_message)
             
             # Phase 4: Pivot Analysis - Analyze response and identify new angles
             logger.info(f"Phase 4: Pivot Analysis for {session_id}")
@@ -145,7 +145,7 @@ class IntelligenceService:
                     message_type="system",
                     metadata={"phase": "completion", "evidence_count": len(state.evidence_pool)}
                 )
-                state.conversation_history.append(completion_message)
+                state.add_message(completion_message)
             
             state.updated_at = datetime.now()
             
@@ -156,7 +156,9 @@ class IntelligenceService:
             logger.error(f"Error processing response for {session_id}: {e}")
             raise
     
-    async def generate_report(self, session_id: str) -> IntelligenceReport:
+    async def generate_report(
+        self, session_id: str, on_chunk: Optional[Callable[[str], Awaitable[None]]] = None
+    ) -> IntelligenceReport:
         """Generate comprehensive intelligence report using Synthesis & Reporting Agent"""
         if session_id not in self.active_investigations:
             raise ValueError(f"Investigation {session_id} not found")
@@ -167,7 +169,7 @@ class IntelligenceService:
             logger.info(f"Generating comprehensive report for {session_id}")
             
             # Phase 7: Synthesis & Reporting - Aggregate intelligence into coherent narratives
-            report = await self.synthesis_agent.generate_report(state)
+            report = await self.synthesis_agent.generate_report(state, on_chunk=on_chunk)
             
             # Update investigation status
             state.status = InvestigationStatus.COMPLETED
@@ -185,7 +187,7 @@ class IntelligenceService:
                     "confidence_score": report.confidence_score
                 }
             )
-            state.conversation_history.append(report_message)
+            state.add_message(report_message)
             
             logger.info(f"Report generated successfully for {session_id}")
             return report
@@ -198,6 +200,10 @@ class IntelligenceService:
         """Get current investigation state"""
         return self.active_investigations.get(session_id)
     
+    def close_investigation(self, session_id: str) -> bool:
+        """Drop an investigation; returns False if it was not active"""
+        return self.active_investigations.pop(session_id, None) is not None
+    
     def _create_pipeline_message(self, state: InvestigationState) -> AgentMessage:
         """Create a message summarizing the pipeline initialization"""
         entities_count = len(state.target_entities)
@@ -235,7 +241,7 @@ class IntelligenceService:
         
         # Check conversation length (avoid infinite loops)
         max_conversation_length = 20  # Maximum conversation turns
-        conversation_length = len([msg for msg in state.conversation_history if msg.agent_name == "User"])
+        conversation_length = len(state.messages_of_type("response"))
         
         # Check if we have sufficient information
         information_gaps = len(state.information_gaps)
@@ -271,16 +277,14 @@ class IntelligenceService:
         """Extract pivot analysis data from the most recent pivot agent message"""
         
         # Look for the most recent pivot agent message
-        pivot_messages = [
-            msg for msg in state.conversation_history 
-            if msg.agent_name == "Pivot Agent" and msg.message_type == "analysis"
-        ]
+        latest_pivot_message = next(
+            (msg for msg in reversed(state.messages_of_type("analysis")) if msg.agent_name == "Pivot Agent"),
+            None
+        )
         
-        if not pivot_messages:
+        if latest_pivot_message is None:
             return None
         
-        latest_pivot_message = pivot_messages[-1]
-        
         # Extract analysis data from metadata if available
         if hasattr(latest_pivot_message, 'metadata') and latest_pivot_message.metadata:
             # Create a simplified pivot analysis structure
@@ -314,7 +318,7 @@ class IntelligenceService:
             "evidence_collected": len(state.evidence_pool),
             "confidence_score": state.confidence_score,
             "information_gaps": len(state.information_gaps),
-            "conversation_turns": len([msg for msg in state.conversation_history if msg.agent_name == "User"]),
+            "conversation_turns": len(state.messages_of_type("response")),
             "current_phase": state.metadata.get("current_phase", "unknown"),
             "complexity": state.metadata.get("complexity", "unknown"),
             "created_at": state.created_at.isoformat(),
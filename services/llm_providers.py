@@ -1,12 +1,27 @@
 from abc import ABC, abstractmethod
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, AsyncIterator, List, Tuple, Type, Union
 import logging
+from pydantic import BaseModel
 from core.config import get_settings
 import google.generativeai as genai
 from google.genai.types import Tool, GenerateContentConfig, GoogleSearch
 
 logger = logging.getLogger(__name__)
 
+# A system prompt is either plain text or a list of Anthropic-style content blocks
+# ({"type": "text", "text": ..., "cache_control": {"type": "ephemeral"}})
+SystemPrompt = Union[str, List[Dict[str, Any]]]
+
+def cacheable_system_blocks(system_prompt: str) -> List[Dict[str, Any]]:
+    """Wrap a static system prompt as a single cacheable prefix block"""
+    return [{"type": "text", "text": system_prompt, "cache_control": {"type": "ephemeral"}}]
+
+def system_prompt_text(system_prompt: SystemPrompt) -> str:
+    """Flatten a system prompt to plain text for providers without structured system blocks"""
+    if isinstance(system_prompt, str):
+        return system_prompt
+    return "".join(block.get("text", "") for block in system_prompt)
+
 class LLMProvider(ABC):
     """Abstract base class for LLM providers"""
     
@@ -15,18 +30,50 @@ class LLMProvider(ABC):
         self.settings = get_settings()
     
     @abstractmethod
-    async def generate(self, prompt: str, system_prompt: str = "", **kwargs) -> str:
-        """Generate text using the LLM"""
+    async def generate(
+        self,
+        prompt: str,
+        system_prompt: SystemPrompt = "",
+        response_schema: Optional[Type[BaseModel]] = None,
+        **kwargs
+    ) -> str:
+        """Generate text using the LLM, as JSON matching response_schema when one is given"""
         pass
+    
+    async def generate_stream(
+        self,
+        prompt: str,
+        system_prompt: SystemPrompt = "",
+        response_schema: Optional[Type[BaseModel]] = None,
+        **kwargs
+    ) -> AsyncIterator[str]:
+        """Stream generated text; providers without native streaming yield the full response once"""
+        if response_schema is not None:
+            kwargs["response_schema"] = response_schema
+        yield await self.generate(prompt, system_prompt, **kwargs)
 
 class ClaudeProvider(LLMProvider):
     """Anthropic Claude provider"""
     
-    async def generate(self, prompt: str, system_prompt: str = "", **kwargs) -> str:
+    async def generate(
+        self,
+        prompt: str,
+        system_prompt: SystemPrompt = "",
+        response_schema: Optional[Type[BaseModel]] = None,
+        **kwargs
+    ) -> str:
         try:
             # In a real implementation, use the Anthropic client
             # import anthropic
             # client = anthropic.AsyncAnthropic(api_key=self.settings.ANTHROPIC_API_KEY)
+            # System blocks carrying cache_control are passed through unchanged so the
+            # static prefix is served from the prompt cache on repeated calls:
+            # response = await client.messages.create(
+            #     model=self.model_name, system=system_prompt,
+            #     messages=[{"role": "user", "content": prompt}], max_tokens=4096)
+            # logger.info(f"Claude cache read tokens: {response.usage.cache_read_input_tokens}")
+            # Structured output is requested as a forced tool call whose input_schema is
+            # response_schema.model_json_schema(); the tool input is the JSON result.
             
             # Simulate Claude response for demo
             logger.info(f"Claude ({self.model_name}) generating response")
@@ -39,11 +86,25 @@ class ClaudeProvider(LLMProvider):
 class OpenAIProvider(LLMProvider):
     """OpenAI GPT provider"""
     
-    async def generate(self, prompt: str, system_prompt: str = "", **kwargs) -> str:
+    async def generate(
+        self,
+        prompt: str,
+        system_prompt: SystemPrompt = "",
+        response_schema: Optional[Type[BaseModel]] = None,
+        **kwargs
+    ) -> str:
         try:
             # In a real implementation, use the OpenAI client
             # from openai import AsyncOpenAI
             # client = AsyncOpenAI(api_key=self.settings.OPENAI_API_KEY)
+            # OpenAI caches prompt prefixes automatically, so the system prompt is sent
+            # byte-identical as the very first message:
+            # messages = [{"role": "system", "content": system_prompt_text(system_prompt)},
+            #             {"role": "user", "content": prompt}]
+            # logger.info(f"OpenAI cached tokens: {response.usage.prompt_tokens_details.cached_tokens}")
+            # Structured output:
+            # response_format={"type": "json_schema", "json_schema": {
+            #     "name": response_schema.__name__, "schema": response_schema.model_json_schema()}}
             
             # Simulate OpenAI response for demo
             logger.info(f"OpenAI ({self.model_name}) generating response")
@@ -56,48 +117,32 @@ class OpenAIProvider(LLMProvider):
 class GeminiProvider(LLMProvider):
     """Google Gemini provider"""
 
-    async def generate(self, prompt: str, system_prompt: str = "", **kwargs) -> str:
+    async def generate(
+        self,
+        prompt: str,
+        system_prompt: SystemPrompt = "",
+        response_schema: Optional[Type[BaseModel]] = None,
+        **kwargs
+    ) -> str:
         if not self.settings.GOOGLE_API_KEY:
             logger.error("GOOGLE_API_KEY not configured.")
             raise ValueError("GOOGLE_API_KEY is not set in the environment or configuration.")
 
         try:
-            genai.configure(api_key=self.settings.GOOGLE_API_KEY)
-            
-            model_init_kwargs = {}
-            if system_prompt:
-                # For Gemini, system instructions are typically passed during model initialization
-                model_init_kwargs['system_instruction'] = system_prompt
-            
-            # model_name should be like "gemini-1.5-flash", "gemini-pro", etc.
-            model = genai.GenerativeModel(self.model_name, **model_init_kwargs)
-            
+            model, tools, generation_config = self._prepare_request(
+                prompt, system_prompt, response_schema, kwargs.get('use_tools', True)
+            )
             logger.info(f"Gemini ({self.model_name}) generating response for prompt: {prompt[:100]}...")
-            
-            # Only include tools for search/research tasks, not for report generation
-            use_tools = kwargs.get('use_tools', True)
-            tools = None
-            
-            if use_tools and not any(keyword in prompt.lower() for keyword in ['generate a comprehensive intelligence report', 'parse the json response', 'analysis based on all collected data']):
-                # Configure the Google Search tool for research tasks
-                tools = [{
-                    "function_declarations": [{
-                        "name": "google_search",
-                        "description": "Search Google for real-time information",
-                        "parameters": {
-                            "type": "OBJECT",
-                            "properties": {
-                                "query": {
-                                    "type": "STRING",
-                                    "description": "The search query"
-                                }
-                            },
-                            "required": ["query"]
-                        }
-                    }]
-                }]
 
-            response = await model.generate_content_async(prompt, tools=tools)
+            response = await model.generate_content_async(
+                prompt, tools=tools, generation_config=generation_config
+            )
+            
+            # Gemini caches identical prompt prefixes implicitly; log hits to confirm the
+            # static system instruction is being reused
+            usage = getattr(response, "usage_metadata", None)
+            if usage is not None and getattr(usage, "cached_content_token_count", 0):
+                logger.info(f"Gemini ({self.model_name}) cache read tokens: {usage.cached_content_token_count}")
             
             full_response_text = ""
             # Iterating through candidates and parts is a robust way to get all text
@@ -142,6 +187,87 @@ class GeminiProvider(LLMProvider):
             # or google.api_core.exceptions.InvalidArgument for model name issues.
             raise # Re-raise the exception to be handled by the caller
 
+    def _prepare_request(
+        self,
+        prompt: str,
+        system_prompt: SystemPrompt,
+        response_schema: Optional[Type[BaseModel]],
+        use_tools: bool
+    ) -> Tuple[Any, Optional[List[Dict[str, Any]]], Optional[Dict[str, Any]]]:
+        """Build the model, tools and generation config shared by generate and generate_stream"""
+        genai.configure(api_key=self.settings.GOOGLE_API_KEY)
+        
+        model_init_kwargs = {}
+        if system_prompt:
+            # For Gemini, system instructions are typically passed during model initialization
+            model_init_kwargs['system_instruction'] = system_prompt_text(system_prompt)
+        
+        # model_name should be like "gemini-1.5-flash", "gemini-pro", etc.
+        model = genai.GenerativeModel(self.model_name, **model_init_kwargs)
+        
+        # Only include tools for search/research tasks, not for report generation
+        tools = None
+        
+        generation_config = None
+        if response_schema is not None:
+            # JSON mode guarantees a syntactically valid body. The shape itself is described
+            # in the prompt, since Gemini's Schema proto rejects pydantic field defaults.
+            # Function-calling tools cannot be combined with a JSON response type.
+            generation_config = {"response_mime_type": "application/json"}
+            use_tools = False
+        
+        if use_tools and not any(keyword in prompt.lower() for keyword in ['generate a comprehensive intelligence report', 'parse the json response', 'analysis based on all collected data']):
+            # Configure the Google Search tool for research tasks
+            tools = [{
+                "function_declarations": [{
+                    "name": "google_search",
+                    "description": "Search Google for real-time information",
+                    "parameters": {
+                        "type": "OBJECT",
+                        "properties": {
+                            "query": {
+                                "type": "STRING",
+                                "description": "The search query"
+                            }
+                        },
+                        "required": ["query"]
+                    }
+                }]
+            }]
+
+        return model, tools, generation_config
+
+    async def generate_stream(
+        self,
+        prompt: str,
+        system_prompt: SystemPrompt = "",
+        response_schema: Optional[Type[BaseModel]] = None,
+        **kwargs
+    ) -> AsyncIterator[str]:
+        if not self.settings.GOOGLE_API_KEY:
+            logger.error("GOOGLE_API_KEY not configured.")
+            raise ValueError("GOOGLE_API_KEY is not set in the environment or configuration.")
+
+        try:
+            model, tools, generation_config = self._prepare_request(
+                prompt, system_prompt, response_schema, kwargs.get('use_tools', True)
+            )
+            logger.info(f"Gemini ({self.model_name}) streaming response for prompt: {prompt[:100]}...")
+
+            response = await model.generate_content_async(
+                prompt, tools=tools, generation_config=generation_config, stream=True
+            )
+            async for chunk in response:
+                for candidate in chunk.candidates:
+                    if candidate.content and candidate.content.parts:
+                        for part in candidate.content.parts:
+                            if getattr(part, 'text', None):
+                                yield part.text
+
+        except Exception as e:
+            logger.error(f"Error streaming Gemini response for {self.model_name} with prompt '{prompt[:100]}...': {e}", exc_info=True)
+            raise
+
 def get_llm_provider(model_name: str) -> LLMProvider:
     """Factory function to get appropriate LLM provider"""
     model_name_lower = model_name.lower()
@@ -0,0 +1,64 @@
+from collections import OrderedDict
+from typing import Any, Optional, Sequence, Tuple
+import hashlib
+import logging
+import threading
+
+from services.embeddings import cosine_similarity, embed_text_cached
+
+logger = logging.getLogger(__name__)
+
+class SemanticCache:
+    """LRU cache answering exact and near-duplicate text lookups"""
+
+    def __init__(self, threshold: float, max_entries: int = 256):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[str, Sequence[float], Any]]" = OrderedDict()
+        # Lookups may run in worker threads; embeddings are computed outside the lock
+        self._lock = threading.Lock()
+
+    def get(self, text: str, scope: str = "") -> Optional[Any]:
+        """Return the value stored for text or its nearest neighbour above threshold within scope"""
+        # Near-duplicate matching only compares entries whose scope is exactly equal, so callers
+        # can pin the parts of a key that must never be fuzzy (e.g. entity names)
+        key = self._key(text, scope)
+        with self._lock:
+            entry = self._entries.get(key)
+            candidates = (
+                [(stored_key, stored) for stored_key, stored in self._entries.items() if stored[0] == scope]
+                if entry is None else None
+            )
+
+        if candidates:
+            # Linear scan is fine at this size; vectors are normalized so cosine is a dot product
+            embedding = embed_text_cached(text)
+            best_score, best_key, best_entry = max(
+                (cosine_similarity(embedding, stored[1]), stored_key, stored)
+                for stored_key, stored in candidates
+            )
+            if best_score >= self.threshold:
+                logger.info(f"Semantic cache hit (similarity {best_score:.3f})")
+                key, entry = best_key, best_entry
+
+        if entry is None:
+            return None
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+        return entry[2]
+
+    def put(self, text: str, value: Any, scope: str = "") -> None:
+        """Store value for text within scope, evicting the least recently used entry when full"""
+        key = self._key(text, scope)
+        # A put usually follows a missed get for the same text, so its embedding is already cached
+        entry = (scope, embed_text_cached(text), value)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _key(self, text: str, scope: str) -> str:
+        """Exact-match key for text within scope"""
+        return hashlib.blake2b(f"{scope}\0{text}".encode(), digest_size=16).hexdigest()
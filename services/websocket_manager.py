@@ -1,14 +1,17 @@
 # services/websocket_manager.py
 from fastapi import WebSocket
-from typing import Dict, List
+from typing import Any, Dict, List
 import logging
-import json
 from datetime import datetime
 
-from models.schemas import WebSocketMessage
+from core.json_utils import json_dumps
 
 logger = logging.getLogger(__name__)
 
+def encode_message(message_type: str, data: Dict[str, Any]) -> str:
+    """Serialize a WebSocketMessage-shaped frame without a pydantic round-trip"""
+    return json_dumps({"type": message_type, "data": data, "timestamp": datetime.now().isoformat()})
+
 class WebSocketManager:
     """Manages WebSocket connections for real-time updates"""
     
@@ -73,9 +76,4 @@ class WebSocketManager:
     
     async def send_investigation_update(self, session_id: str, update_type: str, data: Dict):
         """Send investigation update to session"""
-        message = WebSocketMessage(
-            type=update_type,
-            data=data,
-            timestamp=datetime.now()
-        )
-        await self.send_personal_message(message.model_dump_json(), session_id)
\ No newline at end of file
+        await self.send_personal_message(encode_message(update_type, data), session_id)
\ No newline at end of file